@@ -15,10 +15,11 @@ def playlist_demo():
     print("PLAYLIST DEMO")
     playlist = get_entity_from_tag("jam4x2+My Playlist")
 
-    for entry in playlist.entries:
+    for entry, song_data in zip(sorted(playlist.playlist_entries, key=lambda entry: entry.index),
+                                playlist.get_song_data()):
 
         print(entry)
-        print(entry.get_song_data())
+        print(song_data)
 
     print("\n\n")
 
@@ -55,6 +55,10 @@ def main():
                 finally:
                     sql_command = ''
 
+    # The seed data only has lifetime play counters, so build the weekly chart rollups from them.
+    backfill_play_rollups(session)
+    session.commit()
+
     print("Done seeding data.")
 
 
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+"""Offline stand-in for the parts of the Spotify Web API that klap4 uses.
+
+Serves the client credentials token endpoint, artist/album search, related artists and single/multi id track lookups
+with made up (but stable) data, plus configurable latency, errors and rate limiting. Point klap4 at it with:
+
+    KLAP4_SPOTIFY_API_URL=http://localhost:8888/v1/ KLAP4_SPOTIFY_TOKEN_URL=http://localhost:8888/api/token ./run.py
+
+``GET /stats`` returns how many requests each endpoint got and how many errors were injected.
+"""
+
+import argparse
+from collections import Counter
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+from threading import Lock
+import time
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_id(name: str) -> str:
+    return sha1(name.casefold().encode()).hexdigest()[:22]
+
+
+def fake_images(kind: str, spotify_id: str) -> list:
+    return [{"url": f"https://i.scdn.co/image/{kind}-{spotify_id}", "height": 640, "width": 640}]
+
+
+def fake_artist(name: str) -> dict:
+    spotify_id = fake_id(name)
+    return {"id": spotify_id, "name": name, "type": "artist", "images": fake_images("artist", spotify_id)}
+
+
+def fake_album(name: str, artist_name: str) -> dict:
+    spotify_id = fake_id(f"{artist_name}/{name}")
+    return {
+        "id": spotify_id,
+        "name": name,
+        "type": "album",
+        "artists": [fake_artist(artist_name)],
+        "images": fake_images("album", spotify_id)
+    }
+
+
+def fake_track(spotify_id: str) -> dict:
+    return {
+        "id": spotify_id,
+        "name": f"Track {spotify_id[:6]}",
+        "type": "track",
+        "album": fake_album(f"Album {spotify_id[:4]}", f"Artist {spotify_id[:3]}"),
+        "artists": [fake_artist(f"Artist {spotify_id[:3]}")]
+    }
+
+
+def parse_search(query: str) -> dict:
+    """Splits a query like ``album:Is This It artist:The Strokes`` into ``{"album": ..., "artist": ...}``."""
+    return {field: value.strip() for field, value in re.findall(r"(\w+):(.*?)(?=\s+\w+:|$)", query)}
+
+
+class EmulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API.
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status: int, body: dict, headers: dict = None) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def inject_faults(self, endpoint: str) -> bool:
+        """Sleeps for the configured latency and maybe answers with an error, returns ``True`` if it did."""
+        server = self.server
+        server.count(endpoint)
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+
+        roll = random.random()
+        if roll < server.rate_limit:
+            server.count("injected_429")
+            self.send_json(429, {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                           {"Retry-After": str(server.retry_after)})
+            return True
+        elif roll < server.rate_limit + server.error_rate:
+            server.count("injected_503")
+            self.send_json(503, {"error": {"status": 503, "message": "Service unavailable"}})
+            return True
+        return False
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlparse(self.path).path != "/api/token":
+            return self.send_json(404, {"error": "not found"})
+        if self.inject_faults("token"):
+            return
+
+        self.send_json(200, {"access_token": fake_id(str(time.time())), "token_type": "Bearer",
+                             "expires_in": self.server.token_lifetime})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/stats":
+            return self.send_json(200, self.server.snapshot())
+
+        if url.path == "/v1/search":
+            if self.inject_faults("search"):
+                return
+            fields = parse_search(query.get("q", ""))
+            if query.get("type", None) == "album":
+                items = [fake_album(fields.get("album", ""), fields.get("artist", ""))]
+                return self.send_json(200, {"albums": {"items": items, "total": 1}})
+            else:
+                items = [fake_artist(fields.get("artist", query.get("q", "")))]
+                return self.send_json(200, {"artists": {"items": items, "total": 1}})
+
+        match = re.fullmatch(r"/v1/artists/(\w+)/related-artists", url.path)
+        if match is not None:
+            if self.inject_faults("related-artists"):
+                return
+            related = [fake_artist(f"Related {match.group(1)[:4]} {i}") for i in range(self.server.related_count)]
+            return self.send_json(200, {"artists": related})
+
+        if url.path == "/v1/tracks":
+            if self.inject_faults("tracks"):
+                return
+            ids = [spotify_id for spotify_id in query.get("ids", "").split(',') if len(spotify_id) > 0]
+            if len(ids) > 50:
+                return self.send_json(400, {"error": {"status": 400, "message": "Too many ids requested"}})
+            return self.send_json(200, {"tracks": [fake_track(spotify_id) for spotify_id in ids]})
+
+        match = re.fullmatch(r"/v1/tracks/(\w+)", url.path)
+        if match is not None:
+            if self.inject_faults("track"):
+                return
+            return self.send_json(200, fake_track(match.group(1)))
+
+        self.send_json(404, {"error": {"status": 404, "message": "Service not found"}})
+
+
+class SpotifyEmulator(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, *, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: float = 0.0, retry_after: int = 1, token_lifetime: int = 3600, related_count: int = 20,
+                 verbose: bool = False):
+        super().__init__(address, EmulatorHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.token_lifetime = token_lifetime
+        self.related_count = related_count
+        self.verbose = verbose
+        self._stats = Counter()
+        self._lock = Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Spotify Web API emulator for load and latency testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.01, help="standard deviation of the added latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 503")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of requests answered with a 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--token-lifetime", type=int, default=3600, help="expires_in of issued tokens")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    server = SpotifyEmulator((args.host, args.port), latency=args.latency, jitter=args.jitter,
+                             error_rate=args.error_rate, rate_limit=args.rate_limit, retry_after=args.retry_after,
+                             token_lifetime=args.token_lifetime, verbose=args.verbose)
+
+    print(f"Spotify emulator listening on {server.url}")
+    print(f"    KLAP4_SPOTIFY_API_URL={server.url}/v1/ KLAP4_SPOTIFY_TOKEN_URL={server.url}/api/token")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Requests served: {server.snapshot()}")
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
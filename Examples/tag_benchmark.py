@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import re
+import timeit
+from pathlib import Path
+
+import yaml
+
+from klap4.db_entities import decompose_tag, KLAP4_TAG, PLAYLIST_TAG, _decompose_tag
+
+
+def legacy_decompose_tag(tag, *, regex_hint=None):
+    """The original decompose_tag, kept here as the baseline to measure against."""
+    regexes = {
+        "klap4": r"([a-z]+)(\d+)?([a-z]+)?(\d+|(\-|\!)[a-z0-9]+)?",
+        "playlist": r"([a-z0-9]+)(?:\+([^\n\+\t]+)(?:\+(\d+))?)?"
+    }
+    if len(tag) == 0:
+        raise ValueError("id must not be empty")
+    elif regex_hint is None:
+        if '+' in tag[:8]:
+            regex_hint = "playlist"
+        else:
+            regex_hint = "klap4"
+
+    matched = re.findall(regexes[regex_hint], tag, re.IGNORECASE)[0]
+    matched = [match if len(match) > 0 else None for match in matched]
+
+    if regex_hint == "klap4":
+        try:
+            matched[1] = int(matched[1])
+            if matched[3][0] == '-':
+                matched[3] = matched[3][1:]
+                matched.append(matched[3])
+                matched[3] = None
+            else:
+                matched[3] = int(matched[3])
+        except (TypeError, ValueError):
+            pass
+
+        return KLAP4_TAG(*matched)
+    else:
+        try:
+            matched[2] = int(matched[2])
+        except (TypeError, ValueError):
+            pass
+
+        return PLAYLIST_TAG(*matched)
+
+
+def load_corpus(data_dir: Path) -> list:
+    """Collects every tag used in the seed data, weighted like a chart run (mostly song tags)."""
+    corpus = []
+    for yaml_file in sorted(data_dir.glob("*.yaml")):
+        with yaml_file.open('r') as f:
+            for fixture in yaml.safe_load(f) or []:
+                tag = fixture.get("fields", {}).get("id")
+                if isinstance(tag, str) and len(tag) > 0:
+                    corpus.append(tag)
+
+    song_tags = [tag for tag in corpus if isinstance(decompose_tag(tag), KLAP4_TAG) and decompose_tag(tag).song_num]
+    return corpus + song_tags * 10
+
+
+def main():
+    script_dir = Path(__file__).absolute().parent
+    corpus = load_corpus(script_dir/".."/"Dummy DB Data")
+    rounds = 200
+
+    for tag in corpus:
+        if legacy_decompose_tag(tag) != decompose_tag(tag):
+            raise RuntimeError(f"Parsers disagree on tag '{tag}'.")
+
+    def run(parser):
+        for tag in corpus:
+            parser(tag)
+
+    # Bypasses the memo cache to measure just the precompiled parser and its fast path.
+    def uncached_decompose_tag(tag):
+        return _decompose_tag.__wrapped__(tag, "playlist" if '+' in tag[:8] else "klap4")
+
+    legacy_time = min(timeit.repeat(lambda: run(legacy_decompose_tag), number=rounds, repeat=3))
+    uncached_time = min(timeit.repeat(lambda: run(uncached_decompose_tag), number=rounds, repeat=3))
+    _decompose_tag.cache_clear()
+    memoized_time = min(timeit.repeat(lambda: run(decompose_tag), number=rounds, repeat=3))
+
+    total = len(corpus) * rounds
+    print(f"Corpus: {len(corpus)} tags ({len(set(corpus))} unique), {rounds} rounds")
+    print(f"Before:              {total / legacy_time:>12,.0f} tags/s")
+    print(f"After (no memo):     {total / uncached_time:>12,.0f} tags/s")
+    print(f"After (memoized):    {total / memoized_time:>12,.0f} tags/s")
+    print(f"Memo cache: {_decompose_tag.cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+
+from klap4 import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exports a chart straight to a file as CSV or NDJSON.")
+    parser.add_argument("form", choices=["all", "new"], help="which chart to export")
+    parser.add_argument("weeks", type=int, help="how many weeks of plays the chart covers (1-104)")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv", dest="fmt")
+    parser.add_argument("-o", "--output", help="file to write to, defaults to stdout")
+    args = parser.parse_args()
+
+    if args.weeks > 104 or args.weeks < 1:
+        parser.error("weeks must be between 1 and 104")
+
+    db.connect("test.db", db_log_level="warning")
+    from klap4.services.charts_services import chart_exporters
+
+    output = open(args.output, 'w', newline='') if args.output is not None else sys.stdout
+    try:
+        output.writelines(chart_exporters[args.fmt](args.form, args.weeks))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
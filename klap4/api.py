@@ -140,6 +140,8 @@ api.add_resource(AlbumListAPI, '/search/album')
 api.add_resource(AlbumAPI, '/display/album/<string:ref>')
 api.add_resource(AlbumReviewAPI, '/album/review/<string:ref>')
 api.add_resource(ChartsAPI, '/charts/<string:form>/<int:weeks>')
+api.add_resource(MultiWindowChartsAPI, '/charts/<string:form>')
+api.add_resource(ChartExportAPI, '/charts/<string:form>/<int:weeks>/export/<string:fmt>')
 api.add_resource(PlaylistAPI, '/playlist/<string:dj_id>')
 api.add_resource(PlaylistEntryAPI, '/playlist/display/<string:dj_id>/<string:p_name>')
 api.add_resource(SongAPI, '/fcc/change/<string:ref>/<string:typ>')
@@ -150,6 +152,19 @@ def search(category):
 
     if request.method == 'GET':
         if category == "program":
+            if count_requested():
+                return jsonify(count=count_search_programming("", ""))
+
+            if page_requested():
+                try:
+                    limit, cursor = page_args()
+                    return jsonify(search_programming_page("", "", limit=limit, cursor=cursor))
+                except ValueError:
+                    return bad_page_request()
+
+            if stream_requested():
+                return stream_json_response(iter_search_programming("", ""))
+
             program_list = search_programming("", "")
             return jsonify(program_list)
 
@@ -158,6 +173,20 @@ def search(category):
         if category == "program":
             p_type = request.get_json()['programType']
             name = request.get_json()['name']
+
+            if count_requested():
+                return jsonify(count=count_search_programming(p_type, name))
+
+            if page_requested():
+                try:
+                    limit, cursor = page_args()
+                    return jsonify(search_programming_page(p_type, name, limit=limit, cursor=cursor))
+                except ValueError:
+                    return bad_page_request()
+
+            if stream_requested():
+                return stream_json_response(iter_search_programming(p_type, name))
+
             program_list = search_programming(p_type, name)
             return jsonify(program_list)
 
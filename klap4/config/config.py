@@ -1,12 +1,39 @@
 from datetime import timedelta
+import os
 
-# Spotify IDs are purposefully broken, as they will be environmental variables in future
+# Spotify IDs are purposefully broken unless set through environmental variables, spotipy's own SPOTIPY_CLIENT_ID and
+# SPOTIPY_CLIENT_SECRET are used if the KLAP4 ones aren't set. The Spotify URLs can also be pointed at a stand-in server
+# such as Examples/spotify_emulator.py.
 def config():
     return {
         "clientOrigin": "http://localhost:8080",
         "accessExpiration": timedelta(hours=6),
         "refreshExpiration": timedelta(hours=6),
-        "spotifyClient": "broken",
-        "spotifySecret": "broken"
+        "spotifyClient": os.environ.get("KLAP4_SPOTIFY_CLIENT", os.environ.get("SPOTIPY_CLIENT_ID", "broken")),
+        "spotifySecret": os.environ.get("KLAP4_SPOTIFY_SECRET", os.environ.get("SPOTIPY_CLIENT_SECRET", "broken")),
+        "spotifyApiUrl": os.environ.get("KLAP4_SPOTIFY_API_URL", "https://api.spotify.com/v1/"),
+        "spotifyTokenUrl": os.environ.get("KLAP4_SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token"),
+        "spotifyFailureThreshold": 5,
+        "spotifyResetTimeout": 30.0,
+        "spotifyTrackBatchSize": 50,
+        "spotifyTrackCacheSize": 4096,
+        "refCacheSize": 4096,
+        "tagCacheSize": 4096,
+        "streamChunkSize": 100,
+        "chartCacheSize": 256,
+        "pageLimit": 50,
+        "maxPageLimit": 500,
+        "spotifyCacheTTL": timedelta(days=30),
+        "spotifyNegativeCacheTTL": timedelta(days=1),
+        "enrichmentWorkers": 8,
+        "enrichmentTimeout": 2.0,
+        "prefetchRate": 2.0,
+        "prefetchQueueSize": 1000,
+        "prefetchSweepInterval": timedelta(hours=6),
+        "httpConnectTimeout": 3.05,
+        "httpReadTimeout": 5,
+        "httpRetries": 3,
+        "httpBackoffFactor": 0.3,
+        "httpMaxRetryAfter": 5
         }
         
\ No newline at end of file
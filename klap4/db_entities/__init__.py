@@ -1,11 +1,16 @@
 from collections import namedtuple
+from functools import lru_cache
 import re
-from typing import Union
+from typing import Iterable, List, Union
 
-from sqlalchemy import func
+import sqlalchemy
+from sqlalchemy import event, func, select, cast, String
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.sql.expression import and_
+from sqlalchemy.sql.expression import and_, tuple_
+
+from klap4.config import config
 
 # Base SQLAlchemy ORM class.
 SQLBase = declarative_base()
@@ -23,6 +28,16 @@ PLAYLIST_TAG = namedtuple("PLAYLIST_TAG", ["dj_id",
                           defaults=[None] * 3)
 
 
+# Compiled once, decompose_tag gets called for every tag that passes through the API.
+_TAG_REGEXES = {
+    "klap4": re.compile(r"([a-z]+)(\d+)?([a-z]+)?(\d+|(\-|\!)[a-z0-9]+)?", re.IGNORECASE),
+    "playlist": re.compile(r"([a-z0-9]+)(?:\+([^\n\+\t]+)(?:\+(\d+))?)?", re.IGNORECASE)
+}
+
+# Fast path for the most common shape of tag, a song (``RR3B5``).
+_SONG_TAG_REGEX = re.compile(r"([a-zA-Z]+)(\d+)([a-zA-Z])(\d+)")
+
+
 def decompose_tag(tag: str, *, regex_hint: Union[str, None] = None) -> Union[KLAP4_TAG, PLAYLIST_TAG]:
     """Decomposes a music id/tag into it's respective attributes.
 
@@ -43,10 +58,6 @@ def decompose_tag(tag: str, *, regex_hint: Union[str, None] = None) -> Union[KLA
     Returns:
          A named tuple containing each of the attributes, or ``None`` if it is not found.
     """
-    regexes = {
-        "klap4": r"([a-z]+)(\d+)?([a-z]+)?(\d+|(\-|\!)[a-z0-9]+)?",
-        "playlist": r"([a-z0-9]+)(?:\+([^\n\+\t]+)(?:\+(\d+))?)?"
-    }
     if len(tag) == 0:
         raise ValueError("id must not be empty")
     elif regex_hint is None:
@@ -54,21 +65,33 @@ def decompose_tag(tag: str, *, regex_hint: Union[str, None] = None) -> Union[KLA
             regex_hint = "playlist"
         else:
             regex_hint = "klap4"
-    elif regex_hint not in regexes:
+    elif regex_hint not in _TAG_REGEXES:
         raise ValueError(f"Unknown regex hint '{regex_hint}'.")
 
+    return _decompose_tag(tag, regex_hint)
+
+
+@lru_cache(maxsize=config.config()["tagCacheSize"])
+def _decompose_tag(tag: str, regex_hint: str) -> Union[KLAP4_TAG, PLAYLIST_TAG]:
+    """Does the actual parsing for decompose_tag, memoized since the same tags get decomposed over and over."""
+    if regex_hint == "klap4":
+        song_match = _SONG_TAG_REGEX.fullmatch(tag)
+        if song_match is not None:
+            genre_abbr, artist_num, album_letter, song_num = song_match.groups()
+            return KLAP4_TAG(genre_abbr, int(artist_num), album_letter, int(song_num))
+
     decomposed_tag = None
-    regex_hint = regex_hint.lower()
 
-    matched = re.findall(regexes[regex_hint], tag, re.IGNORECASE)[0]
-    matched = [match if len(match) > 0 else None for match in matched]
+    match = _TAG_REGEXES[regex_hint].search(tag)
+    if match is None:
+        raise ValueError(f"Malformed {regex_hint} tag '{tag}'.")
+    matched = [group if group else None for group in match.groups()]
 
     if regex_hint == "klap4":
         try:
             matched[1] = int(matched[1])
             if matched[3][0] == '-':
-                matched[3] = matched[3][1:]
-                matched.append(matched[3])
+                matched[4] = matched[3][1:]
                 matched[3] = None
             else:
                 matched[3] = int(matched[3])
@@ -111,104 +134,331 @@ from klap4.db_entities.song import *
 from klap4.db_entities.label_and_promoter import *
 from klap4.db_entities.playlist import *
 from klap4.db_entities.program import *
+from klap4.db_entities.play_history import *
+from klap4.db_entities.spotify_cache import *
+
+from klap4.utils.cache import LRUCache
+
+
+# Maps decomposed catalog tags (genre, artist, album and song levels) to the identity of the entity they resolve to.
+ref_cache = LRUCache(config.config()["refCacheSize"])
+
+# Only catalog tags are cached, reviews and playlist entries get renumbered without touching the catalog.
+_CACHED_TAG_LEVELS = ("genre", "artist", "album", "song")
+
+# Columns that make up the tag of each cached catalog entity, renumbering any of them invalidates the cache.
+_ref_columns = {
+    Genre: ("abbreviation",),
+    Artist: ("genre_id", "number"),
+    Album: ("artist_id", "letter"),
+    Song: ("album_id", "number"),
+}
+
+
+def _invalidate_ref_cache(mapper, connection, target) -> None:
+    ref_cache.clear()
+
+
+def _invalidate_ref_cache_if_renumbered(mapper, connection, target) -> None:
+    state = sqlalchemy.inspect(target)
+    if any(state.attrs[column].history.has_changes() for column in _ref_columns[type(target)]):
+        ref_cache.clear()
+
+
+for _entity_type in _ref_columns:
+    event.listen(_entity_type, "after_insert", _invalidate_ref_cache)
+    event.listen(_entity_type, "after_update", _invalidate_ref_cache_if_renumbered)
+    event.listen(_entity_type, "after_delete", _invalidate_ref_cache)
+
+
+# The materialized ``ref`` column of each entity is built from its parent's ref (or the genre's abbreviation).
+_parent_refs = {
+    Artist: (Artist.genre_id, Genre.abbreviation, lambda target: str(target.number)),
+    Album: (Album.artist_id, Artist.ref, lambda target: target.letter),
+    Song: (Song.album_id, Album.ref, lambda target: str(target.number)),
+    AlbumReview: (AlbumReview.album_id, Album.ref, lambda target: f"-R{target.id}"),
+}
+
+
+def _compute_ref(connection, target) -> str:
+    parent_id_column, parent_ref_column, suffix = _parent_refs[type(target)]
+    parent_id = getattr(target, parent_id_column.key)
+
+    parent_ref = connection.execute(
+        select([parent_ref_column]).where(parent_ref_column.table.c.id == parent_id)
+    ).scalar()
+
+    return parent_ref + suffix(target)
+
+
+def _refresh_refs(connection, entity_type, where) -> None:
+    """Recomputes the materialized refs of every ``entity_type`` row matching ``where``, and of all rows beneath them."""
+    parent_id_column, parent_ref_column, _ = _parent_refs[entity_type]
+    parent_ref = select([parent_ref_column]) \
+        .where(parent_ref_column.table.c.id == parent_id_column) \
+        .as_scalar()
+
+    if entity_type is Artist:
+        new_ref = parent_ref + cast(Artist.number, String)
+    elif entity_type is Album:
+        new_ref = parent_ref + Album.letter
+    elif entity_type is Song:
+        new_ref = parent_ref + cast(Song.number, String)
+    else:
+        new_ref = parent_ref + "-R" + cast(AlbumReview.id, String)
+
+    connection.execute(entity_type.__table__.update().where(where).values(ref=new_ref))
+
+    ids = select([entity_type.id]).where(where)
+    if entity_type is Artist:
+        _refresh_refs(connection, Album, Album.artist_id.in_(ids))
+    elif entity_type is Album:
+        _refresh_refs(connection, Song, Song.album_id.in_(ids))
+        _refresh_refs(connection, AlbumReview, AlbumReview.album_id.in_(ids))
+
+
+def _set_ref(mapper, connection, target) -> None:
+    target.ref = _compute_ref(connection, target)
+
+
+def _set_ref_if_renumbered(mapper, connection, target) -> None:
+    state = sqlalchemy.inspect(target)
+    if any(state.attrs[column].history.has_changes() for column in _ref_columns.get(type(target), ())):
+        target.ref = _compute_ref(connection, target)
+
+
+def _refresh_child_refs(mapper, connection, target) -> None:
+    if not sqlalchemy.inspect(target).attrs.ref.history.has_changes():
+        return
+
+    if isinstance(target, Artist):
+        _refresh_refs(connection, Album, Album.artist_id == target.id)
+    elif isinstance(target, Album):
+        _refresh_refs(connection, Song, Song.album_id == target.id)
+        _refresh_refs(connection, AlbumReview, AlbumReview.album_id == target.id)
+
+
+def _refresh_artist_refs(mapper, connection, target) -> None:
+    if sqlalchemy.inspect(target).attrs.abbreviation.history.has_changes():
+        _refresh_refs(connection, Artist, Artist.genre_id == target.id)
+
+
+for _entity_type in _parent_refs:
+    event.listen(_entity_type, "before_insert", _set_ref)
+    event.listen(_entity_type, "before_update", _set_ref_if_renumbered)
+    event.listen(_entity_type, "after_update", _refresh_child_refs)
+event.listen(Genre, "after_update", _refresh_artist_refs)
+
+
+# The result of resolving one tag out of a batch, ``error`` is set (and ``entity`` is ``None``) if it was not found.
+RESOLVED_TAG = namedtuple("RESOLVED_TAG", ["tag", "entity", "error"])
+
+# SQLite only allows so many bound parameters per statement, batched lookups are chunked to stay under it.
+_MAX_BOUND_PARAMETERS = 900
+
+
+def _tag_level(tag: Union[KLAP4_TAG, PLAYLIST_TAG]) -> Union[str, None]:
+    """Figures out which entity a decomposed tag resolves to, or ``None`` if it does not reference anything."""
+    if isinstance(tag, KLAP4_TAG) and tag.genre_abbr is not None:
+        if tag.artist_num is None:
+            return "genre"
+        elif tag.album_letter is None:
+            return "artist"
+        elif tag.song_num is not None:
+            return "song"
+        elif tag.album_review_dj_id is not None:
+            return "album_review"
+        else:
+            return "album"
+    elif isinstance(tag, PLAYLIST_TAG) and tag.dj_id is not None:
+        if tag.name is None:
+            return "dj"
+        elif tag.song_num is None:
+            return "playlist"
+        else:
+            return "playlist_entry"
+
+    return None
+
+
+def _tag_level_query(session, level: str) -> tuple:
+    """Builds the query for one tag level along with the columns a tag's values are matched against.
+
+    Catalog entities are matched on their materialized ``ref`` column, so the lookup is a single indexed probe. Every
+    parent level is still joined into the same statement (and eagerly populated from it), so using the parents of the
+    result does not cost another round trip.
+
+    Returns:
+        A ``(query, tag_columns)`` tuple, the columns are in the same order as ``_tag_values`` returns.
+    """
+    if level == "genre":
+        return session.query(Genre), (Genre.abbreviation,)
+    elif level == "artist":
+        return session.query(Artist) \
+            .join(Artist.genre) \
+            .options(contains_eager(Artist.genre)), \
+            (Artist.ref,)
+    elif level == "album":
+        return session.query(Album) \
+            .join(Album.artist) \
+            .join(Artist.genre) \
+            .options(contains_eager(Album.artist).contains_eager(Artist.genre)), \
+            (Album.ref,)
+    elif level == "song":
+        return session.query(Song) \
+            .join(Song.album) \
+            .join(Album.artist) \
+            .join(Artist.genre) \
+            .options(contains_eager(Song.album).contains_eager(Album.artist).contains_eager(Artist.genre)), \
+            (Song.ref,)
+    elif level == "album_review":
+        return session.query(AlbumReview) \
+            .join(AlbumReview.album) \
+            .join(Album.artist) \
+            .join(Artist.genre) \
+            .options(contains_eager(AlbumReview.album).contains_eager(Album.artist).contains_eager(Artist.genre)), \
+            (Album.ref, AlbumReview.dj_id)
+    elif level == "dj":
+        return session.query(DJ), (DJ.id,)
+    elif level == "playlist":
+        return session.query(Playlist), (Playlist.dj_id, Playlist.name)
+    elif level == "playlist_entry":
+        return session.query(PlaylistEntry) \
+            .join(PlaylistEntry.playlist) \
+            .options(contains_eager(PlaylistEntry.playlist)), \
+            (Playlist.dj_id, Playlist.name, PlaylistEntry.index)
+
+    raise ValueError(f"Unknown tag level '{level}'.")
+
+
+def _tag_values(tag: Union[KLAP4_TAG, PLAYLIST_TAG], level: str) -> tuple:
+    """Pulls out the values of a tag that are matched against the tag columns of its level."""
+    if level in ("artist", "album", "song"):
+        return ''.join(str(value) for value in tag[:4] if value is not None),
+    elif level == "album_review":
+        return f"{tag.genre_abbr}{tag.artist_num}{tag.album_letter}", tag.album_review_dj_id
+
+    return tuple(value for value in tag if value is not None)
 
 
-def get_entity_from_tag(tag: Union[str, KLAP4_TAG, PLAYLIST_TAG]) -> SQLBase:
+def _tag_str(tag: Union[KLAP4_TAG, PLAYLIST_TAG]) -> str:
+    return ''.join([str(d) if d is not None else '' for d in tag])
+
+
+def _tag_query(session, tag: Union[KLAP4_TAG, PLAYLIST_TAG]):
+    """Builds a single query that resolves a decomposed tag to its deepest entity.
+
+    Returns:
+        The query, or ``None`` if the tag does not reference anything.
+    """
+    level = _tag_level(tag)
+    if level is None:
+        return None
+
+    query, tag_columns = _tag_level_query(session, level)
+    return query.filter(and_(*[column == value for column, value in zip(tag_columns, _tag_values(tag, level))]))
+
+
+def get_entity_from_tag(tag: Union[str, KLAP4_TAG, PLAYLIST_TAG], *, options: Iterable = ()) -> SQLBase:
+    """Resolves a tag to the entity it references.
+
+    Args:
+        tag: The tag, as a string or already decomposed.
+        options: Loader options to apply to the lookup (e.g. eager loading everything a serializer needs).
+
+    Returns:
+        The entity, or ``None`` if the tag does not reference anything.
+    """
     # If tag is a string, turn it into a named tuple
     if isinstance(tag, str):
         tag = decompose_tag(tag)
 
     entity = None
 
+    options = list(options)
+    cacheable = _tag_level(tag) in _CACHED_TAG_LEVELS
+
     try:
         from klap4.db import Session
         session = Session()
-        if isinstance(tag, KLAP4_TAG) and tag.genre_abbr is not None:
-            entity = session.query(Genre) \
-                .filter(Genre.abbreviation == tag.genre_abbr) \
-                .one()
-
-            if tag.artist_num is not None and entity is not None:
-                entity = session.query(Artist) \
-                    .join(
-                        Genre, and_(
-                            Genre.id == Artist.genre_id,
-                            Genre.abbreviation == tag.genre_abbr
-                        )
-                    ) \
-                    .filter(
-                            Artist.number == tag.artist_num
-                    ) \
-                    .one()
-
-                if entity is not None and tag.album_letter is not None:
-                    entity = session.query(Album) \
-                        .join(
-                            Artist, and_(
-                                Artist.id == Album.artist_id,
-                                Artist.number == tag.artist_num
-                            )
-                        ) \
-                        .join(
-                            Genre, and_(
-                                Genre.id == Artist.genre_id,
-                                Genre.abbreviation == tag.genre_abbr
-                            )
-                        ) \
-                        .filter(
-                                Album.letter == tag.album_letter
-                        ) \
-                        .one()
-
-                    if entity is not None and tag.song_num is not None:
-                        entity = session.query(Song) \
-                            .filter(
-                                and_(
-                                    Song.genre_abbr == tag.genre_abbr,
-                                    Song.artist_num == tag.artist_num,
-                                    Song.album_letter == tag.album_letter,
-                                    Song.number == tag.song_num
-                                )
-                            ) \
-                            .one()
-                    elif entity is not None and tag.album_review_dj_id is not None:
-                        entity = session.query(AlbumReview) \
-                            .filter(
-                                and_(
-                                    AlbumReview.genre_abbr == tag.genre_abbr,
-                                    AlbumReview.artist_num == tag.artist_num,
-                                    AlbumReview.album_letter == tag.album_letter,
-                                    AlbumReview.dj_id == tag.album_review_dj_id
-                                )
-                            ) \
-                            .one()
-        elif isinstance(tag, PLAYLIST_TAG) and tag.dj_id is not None:
-            entity = session.query(DJ) \
-                .filter(DJ.id == tag.dj_id) \
-                .one()
-
-            if tag.name is not None:
-                entity = session.query(Playlist) \
-                    .filter(
-                        and_(
-                            Playlist.dj_id == tag.dj_id,
-                            Playlist.name == tag.name
-                        )
-                    ) \
-                    .one()
-
-                if tag.song_num is not None:
-                    entity = session.query(PlaylistEntry) \
-                        .filter(
-                            and_(
-                                PlaylistEntry.dj_id == tag.dj_id,
-                                PlaylistEntry.playlist_name == tag.name,
-                                PlaylistEntry.index == tag.song_num
-                            )
-                        ) \
-                        .one()
+
+        # A cache hit can come straight out of the identity map, which would skip any eager loading asked for.
+        if cacheable and len(options) == 0:
+            cached = ref_cache.get(tag)
+            if cached is not None:
+                entity_type, identity = cached
+                entity = session.query(entity_type).get(identity)
+                if entity is not None:
+                    return entity
+                ref_cache.pop(tag)
+
+        query = _tag_query(session, tag)
+        if query is not None:
+            entity = query.options(*options).one()
+
+            if cacheable:
+                ref_cache.put(tag, (type(entity), sqlalchemy.inspect(entity).identity))
     except NoResultFound as e:
-        tag_str = ''.join([str(d) if d is not None else '' for d in tag])
-        raise NoResultFound(f"No tag found: '{tag_str}'") from e
+        raise NoResultFound(f"No tag found: '{_tag_str(tag)}'") from e
 
     return entity
+
+
+def get_entities_from_tags(tags: Iterable[Union[str, KLAP4_TAG, PLAYLIST_TAG]]) -> List[RESOLVED_TAG]:
+    """Resolves many tags at once with a fixed number of queries.
+
+    Tags are grouped by the entity they resolve to and each group is fetched with a single ``IN`` over its tag columns
+    (chunked to stay under the database's bound parameter limit), instead of one query per tag.
+
+    Args:
+        tags: The tags to resolve, as strings or already decomposed.
+
+    Returns:
+        One ``RESOLVED_TAG`` per input tag, in input order. Tags that could not be found have their ``error`` set.
+    """
+    from klap4.db import Session
+    session = Session()
+
+    tags = list(tags)
+    decomposed_tags = [None] * len(tags)
+    errors = [None] * len(tags)
+    levels = {}
+
+    for i, tag in enumerate(tags):
+        try:
+            decomposed_tags[i] = decompose_tag(tag) if isinstance(tag, str) else tag
+        except (ValueError, IndexError) as e:
+            errors[i] = str(e)
+            continue
+
+        level = _tag_level(decomposed_tags[i])
+        if level is not None:
+            levels.setdefault(level, {}).setdefault(_tag_values(decomposed_tags[i], level), []).append(i)
+
+    entities = [None] * len(tags)
+    for level, indices_by_values in levels.items():
+        query, tag_columns = _tag_level_query(session, level)
+        query = query.add_columns(*tag_columns)
+
+        if len(tag_columns) == 1:
+            match_column = tag_columns[0]
+            all_values = [values[0] for values in indices_by_values]
+        else:
+            match_column = tuple_(*tag_columns)
+            all_values = list(indices_by_values)
+
+        chunk_size = max(1, _MAX_BOUND_PARAMETERS // len(tag_columns))
+        for chunk_start in range(0, len(all_values), chunk_size):
+            chunk = all_values[chunk_start:chunk_start + chunk_size]
+            for entity, *values in query.filter(match_column.in_(chunk)):
+                for i in indices_by_values.get(tuple(values), []):
+                    entities[i] = entity
+
+        for values, indices in indices_by_values.items():
+            for i in indices:
+                if entities[i] is None:
+                    errors[i] = f"No tag found: '{_tag_str(decomposed_tags[i])}'"
+                elif level in _CACHED_TAG_LEVELS:
+                    ref_cache.put(decomposed_tags[i], (type(entities[i]), sqlalchemy.inspect(entities[i]).identity))
+
+    return [RESOLVED_TAG(tag, entity, error) for tag, entity, error in zip(tags, entities, errors)]
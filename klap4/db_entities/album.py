@@ -2,42 +2,47 @@
 
 from datetime import datetime, timedelta
 
-from sqlalchemy import Column, ForeignKey, UniqueConstraint, Boolean, DateTime, String, Integer
-from sqlalchemy.orm import backref, relationship
+from sqlalchemy import Column, ForeignKey, Index, UniqueConstraint, Boolean, DateTime, String, Integer
+from sqlalchemy.orm import backref, joinedload, relationship, selectinload
 from sqlalchemy.sql.expression import and_
 
 import klap4.db
 from klap4.db_entities.genre import Genre
 from klap4.db_entities.artist import Artist
-from klap4.db_entities import decompose_tag, full_module_name, SQLBase
-from klap4.utils.spotify_utils import getAlbumCover
+from klap4.db_entities import decompose_tag, full_module_name, SQLBase, KLAP4_TAG
+from klap4.db_entities.spotify_cache import get_album_cover
+from klap4.utils.enrichment import Enrichment
 
 
 def find_artist_id(genre_abbr: str, artist_num: int):
     entity = None
     try:
-        from klap4.db import Session
-        session = Session()
-
-        entity = session.query(Artist) \
-            .join(Genre, and_(Genre.id == Artist.genre_id, Genre.abbreviation == genre_abbr)) \
-            .filter(Artist.number == artist_num).one()
+        from klap4.db_entities import get_entity_from_tag
+        entity = get_entity_from_tag(KLAP4_TAG(genre_abbr, artist_num))
         
         return entity.id
     except:
         raise "error"
 
 
+def album_display_options() -> list:
+    """Loader options for everything Album.serialize touches, so displaying an album costs a fixed number of queries
+    no matter how many songs, reviews or problems it has. The artist and genre are already joined in by the tag lookup.
+    """
+    return [
+        joinedload(Album.label),
+        joinedload(Album.promoter),
+        selectinload(Album.reviews),
+        selectinload(Album.problems),
+        selectinload(Album.songs),
+    ]
+
+
 def find_album(genre_abbr: str, artist_num: int, album_letter: str):
     entity = None
     try:
-        from klap4.db import Session
-        session = Session()
-
-        entity = session.query(Album) \
-            .join(Artist, and_(Artist.id == Album.artist_id, Artist.number == artist_num)) \
-            .join(Genre, and_(Genre.id == Artist.genre_id, Genre.abbreviation == genre_abbr)) \
-            .filter(Album.letter == album_letter).one()
+        from klap4.db_entities import get_entity_from_tag
+        entity = get_entity_from_tag(KLAP4_TAG(genre_abbr, artist_num, album_letter))
         
         return entity
     except:
@@ -45,6 +50,7 @@ def find_album(genre_abbr: str, artist_num: int, album_letter: str):
 
 class Album(SQLBase):
     __tablename__ = "album"
+    __table_args__ = (Index('album_artist_letter_index', 'artist_id', 'letter'),)
 
     class FORMAT:
         VINYL = 0b00001
@@ -62,6 +68,7 @@ class Album(SQLBase):
     format_bitfield = Column(Integer, nullable=False)
     label_id = Column(Integer, ForeignKey('label.id'), nullable=True)
     promoter_id = Column(Integer, ForeignKey('promoter.id'), nullable=True)
+    ref = Column(String, nullable=False, index=True)  # Materialized, kept up to date by klap4.db_entities.
 
     artist = relationship("klap4.db_entities.artist.Artist", back_populates="albums")
     label = relationship("klap4.db_entities.label_and_promoter.Label", back_populates="albums")
@@ -114,12 +121,11 @@ class Album(SQLBase):
         
         return sum
 
-    @property
-    def ref(self):
-        return self.artist.ref + self.letter
-    
 
     def serialize(self):
+        # Start on the cover art right away so it overlaps with the rest of the serialization.
+        cover = Enrichment(get_album_cover, self.name, self.artist.name)
+
         review_list = []
         problem_list = []
         song_list = []
@@ -160,7 +166,7 @@ class Album(SQLBase):
                             "reviews": review_list,
                             "problems": problem_list,
                             "songs": song_list,
-                            "image": getAlbumCover(self.name, self.artist.name)
+                            "image": cover.result()
                             }
         return serialized_album
 
@@ -187,6 +193,7 @@ class AlbumReview(SQLBase):
     dj_id = Column(String, ForeignKey("dj.id", onupdate="CASCADE", ondelete="CASCADE"), nullable=False)
     date_entered = Column(DateTime, nullable=False)
     content = Column(String, nullable=False)
+    ref = Column(String, nullable=False, index=True)  # Materialized, kept up to date by klap4.db_entities.
     
     album = relationship("klap4.db_entities.album.Album", back_populates="reviews")
     dj = relationship("klap4.db_entities.dj.DJ", back_populates="reviews")
@@ -207,10 +214,6 @@ class AlbumReview(SQLBase):
     def is_recent(self):
         return datetime.now() - self.date_entered < timedelta(weeks=4)
 
-    @property
-    def ref(self):
-        return self.album.ref + '-R' + str(self.id)
-    
 
     @property
     def serialize(self):
@@ -1,20 +1,20 @@
 #!/usr/bin/env python3
 
-from sqlalchemy import Column, ForeignKey, String, Integer
+from sqlalchemy import Column, ForeignKey, Index, String, Integer, func, select
 from sqlalchemy.orm import backref, relationship
 
 import klap4.db
 from klap4.db_entities.genre import Genre
-from klap4.db_entities import decompose_tag, full_module_name, SQLBase
-from klap4.utils.spotify_utils import getArtistImage, getRelatedArtists
+from klap4.db_entities import decompose_tag, full_module_name, SQLBase, KLAP4_TAG
+from klap4.db_entities.spotify_cache import get_artist_metadata
+from klap4.utils.enrichment import Enrichment
 
 def find_genre_id(genre_abbr: str):
     entity = None
 
     try:
-        from klap4.db import Session
-        session = Session()
-        entity = session.query(Genre).filter(Genre.abbreviation == genre_abbr).one()
+        from klap4.db_entities import get_entity_from_tag
+        entity = get_entity_from_tag(KLAP4_TAG(genre_abbr))
 
         return entity.id
     except:
@@ -23,11 +23,13 @@ def find_genre_id(genre_abbr: str):
 
 class Artist(SQLBase):
     __tablename__ = "artist"
+    __table_args__ = (Index('artist_genre_number_index', 'genre_id', 'number'),)
 
     id = Column(Integer, primary_key=True)
     genre_id = Column(Integer, ForeignKey("genre.id", onupdate="CASCADE", ondelete="CASCADE"), nullable=False)
     number = Column(Integer, nullable=False)
     name = Column(String, nullable=False)
+    ref = Column(String, nullable=False, index=True)  # Materialized, kept up to date by klap4.db_entities.
 
     genre = relationship("klap4.db_entities.genre.Genre", back_populates="artists")
     albums = relationship("klap4.db_entities.album.Album", back_populates="artist", cascade="all, delete-orphan")
@@ -54,31 +56,50 @@ class Artist(SQLBase):
         return chr(ord('A') + len(self.albums))  # TODO: Handle letter wrap around ('Z' -> 'AA')
         # 'A' + 3 == 'D'
 
-    @property
-    def ref(self):
-        return self.genre.ref + str(self.number)
-    
 
     def serialize(self):
+        from klap4.db import Session
+        from klap4.db_entities.album import Album, AlbumReview, AlbumProblem
+        session = Session()
+
+        spotify_metadata = Enrichment(get_artist_metadata, self.name, default=(None, None))
+
+        # Count reviews and problems in the same query as the albums rather than loading every one of them.
+        review_count = select([func.count(AlbumReview.id)]) \
+            .where(AlbumReview.album_id == Album.id) \
+            .as_scalar()
+        problem_count = select([func.count(AlbumProblem.id)]) \
+            .where(AlbumProblem.album_id == Album.id) \
+            .as_scalar()
+
+        albums = session.query(Album, review_count, problem_count) \
+            .filter(Album.artist_id == self.id) \
+            .order_by(Album.letter) \
+            .all()
+
         album_list = []
-        for album in self.albums:
+        for album, num_reviews, num_problems in albums:
             album_list.append({
                                 "id": album.ref,
                                 "album_name": album.name,
                                 "album_format": album.format_bitfield,
                                 "new_album": album.is_new,
-                                "has_reviews": True if len(album.reviews) > 0 else False,
-                                "has_problems": True if len(album.problems) > 0 else False,
+                                "has_reviews": num_reviews > 0,
+                                "has_problems": num_problems > 0,
+                                "review_count": num_reviews,
+                                "problem_count": num_problems,
                                 "missing": album.missing
                             })
 
+        image, related_artists = spotify_metadata.result()
+
         serialized_artist = {
                                 "id": self.ref,
                                 "name": self.name,
                                 "genre": self.genre.name,
                                 "albums": album_list,
-                                "image": getArtistImage(self.name),
-                                "related_artists": getRelatedArtists(self.name)
+                                "image": image,
+                                "related_artists": related_artists
                             }
         return serialized_artist
 
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Column, ForeignKey, Index, Date, DateTime, Integer
+
+from klap4.db_entities import SQLBase
+
+
+def week_start(moment: datetime) -> date:
+    """The Monday of the week ``moment`` falls in, weekly play rollups are keyed by it."""
+    day = moment.date() if isinstance(moment, datetime) else moment
+    return day - timedelta(days=day.weekday())
+
+
+class PlayEvent(SQLBase):
+    __tablename__ = "play_event"
+    __table_args__ = (Index('play_event_played_at_index', 'played_at'),)
+
+    id = Column(Integer, primary_key=True)
+    song_id = Column(Integer, ForeignKey("song.id", onupdate="CASCADE", ondelete="CASCADE"), nullable=False)
+    album_id = Column(Integer, ForeignKey("album.id", onupdate="CASCADE", ondelete="CASCADE"), nullable=False)
+    played_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<PlayEvent(id={self.id}, " \
+                          f"song_id={self.song_id}, " \
+                          f"album_id={self.album_id}, " \
+                          f"played_at={self.played_at})>"
+
+
+class AlbumWeeklyPlays(SQLBase):
+    __tablename__ = "album_weekly_plays"
+    __table_args__ = (Index('album_weekly_plays_week_index', 'week_start', 'album_id'),)
+
+    album_id = Column(Integer, ForeignKey("album.id", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    plays = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<AlbumWeeklyPlays(album_id={self.album_id}, " \
+                                 f"week_start={self.week_start}, " \
+                                 f"plays={self.plays})>"
+
+
+def _add_weekly_plays(session, album_id: int, week: date, plays: int) -> None:
+    updated = session.query(AlbumWeeklyPlays) \
+        .filter(AlbumWeeklyPlays.album_id == album_id,
+                AlbumWeeklyPlays.week_start == week) \
+        .update({AlbumWeeklyPlays.plays: AlbumWeeklyPlays.plays + plays}, synchronize_session=False)
+
+    if updated == 0:
+        session.add(AlbumWeeklyPlays(album_id=album_id, week_start=week, plays=plays))
+
+
+def record_play(session, song, played_at: datetime = None) -> PlayEvent:
+    """Logs a play of ``song`` and counts it towards its album's weekly rollup, the caller commits."""
+    if played_at is None:
+        played_at = datetime.now()
+
+    play_event = PlayEvent(song_id=song.id, album_id=song.album_id, played_at=played_at)
+    session.add(play_event)
+    _add_weekly_plays(session, song.album_id, week_start(played_at), 1)
+
+    return play_event
+
+
+def backfill_play_rollups(session) -> None:
+    """Seeds the weekly rollups from the lifetime ``Song.times_played`` counters for a database without play history.
+
+    The counters carry no history, so every song's plays are put in the week it was last played.
+    """
+    from klap4.db_entities.song import Song
+
+    if session.query(AlbumWeeklyPlays).first() is not None:
+        return
+
+    rollups = {}
+    for album_id, last_played, times_played in session.query(Song.album_id, Song.last_played, Song.times_played) \
+            .filter(Song.times_played > 0):
+        key = (album_id, week_start(last_played))
+        rollups[key] = rollups.get(key, 0) + times_played
+
+    session.add_all(AlbumWeeklyPlays(album_id=album_id, week_start=week, plays=plays)
+                    for (album_id, week), plays in rollups.items())
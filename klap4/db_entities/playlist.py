@@ -7,6 +7,7 @@ import klap4.db
 from klap4.db_entities import SQLBase, decompose_tag
 from klap4.db_entities.dj import DJ
 from klap4.utils import *
+from klap4.utils.json_utils import ColumnSerializer
 
 
 def find_playlist_id(dj_id: str, playlist_name: str):
@@ -52,6 +53,12 @@ class Playlist(SQLBase):
     def ref(self):
         return f"{self.dj_id}+{self.name}"
 
+    def get_song_data(self) -> list:
+        """The song data of every entry in order, with Spotify tracks looked up in batches rather than one by one."""
+        entries = sorted(self.playlist_entries, key=lambda entry: entry.index)
+        song_data = get_metadata_batch((entry.reference_type, entry.reference) for entry in entries)
+        return [entry._with_entry_song(data) for entry, data in zip(entries, song_data)]
+
     def __repr__(self):
         return f"<Playlist(ref={self.ref}, " \
                          f"show={self.show})>"
@@ -99,10 +106,16 @@ class PlaylistEntry(SQLBase):
 
     def get_song_data(self) -> json:
         try:
-            return get_metadata[self.reference_type](self.reference)
+            return self._with_entry_song(get_metadata[self.reference_type](self.reference))
         except KeyError as e:
             raise KeyError(f"No playlist reference type '{self.reference_type}'.") from e
 
+    def _with_entry_song(self, song_data: json) -> json:
+        # Library entries only reference the album the song is on, the song itself is named in the entry.
+        if self.in_library and song_data is not None and song_data["song"] is None:
+            song_data = {**song_data, "song": self.entry.get("song", None)}
+        return song_data
+
     @property
     def ref(self):
         return f"{self.playlist.ref}+{self.index}"
@@ -115,3 +128,8 @@ class PlaylistEntry(SQLBase):
         return f"<PlaylistEntry(ref={self.ref}, " \
                               f"reference_type={self.reference_type}, " \
                               f"reference={self.reference[:20] + '...' if len(self.reference) > 20 else self.reference})>"
+
+
+# Column-only serializers for listing playlists and their entries without loading ORM instances.
+playlist_serializer = ColumnSerializer.for_entity(Playlist)
+playlist_entry_serializer = ColumnSerializer.for_entity(PlaylistEntry)
@@ -7,6 +7,7 @@ from sqlalchemy.orm import backref, relationship
 
 import klap4.db
 from klap4.db_entities import SQLBase
+from klap4.utils.json_utils import ColumnSerializer
 
 
 class ProgramFormat(SQLBase):
@@ -161,3 +162,11 @@ class Quarter(SQLBase):
         return f"<Quarter(id={self.id}, " \
                     f"begin={self.begin}, " \
                     f"end={self.end})>"
+
+
+# Column-only serializers for the program log listings, these skip loading ORM instances.
+program_slot_serializer = ColumnSerializer.for_entity(ProgramSlot)
+program_log_entry_serializer = ColumnSerializer.for_entity(
+    ProgramLogEntry,
+    id=lambda entry: str(entry["program_type"]) + str(entry["slot_id"]) + str(entry["timestamp"])
+)
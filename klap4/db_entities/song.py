@@ -2,26 +2,22 @@
 
 from datetime import datetime, timedelta
 
-from sqlalchemy import Column, ForeignKey, Boolean, DateTime, String, Integer
+from sqlalchemy import Column, ForeignKey, Index, Boolean, DateTime, String, Integer
 from sqlalchemy.orm import backref, relationship
 from sqlalchemy.sql.expression import and_
 
 import klap4.db
 from klap4.db_entities.artist import Artist
 from klap4.db_entities.album import Album, find_artist_id
-from klap4.db_entities import decompose_tag, SQLBase
+from klap4.db_entities import decompose_tag, SQLBase, KLAP4_TAG
 
 
 def find_album_id(genre_abbr: str, artist_num: int, album_letter: str):
     entity = None
 
     try:
-        from klap4.db import Session
-        session = Session()
-
-        artist_id = find_artist_id(genre_abbr, artist_num)
-        entity = session.query(Album) \
-            .filter(Album.artist_id == artist_id, Album.letter == album_letter).one()
+        from klap4.db_entities import get_entity_from_tag
+        entity = get_entity_from_tag(KLAP4_TAG(genre_abbr, artist_num, album_letter))
         
         return entity.id
     except:
@@ -31,6 +27,7 @@ def find_album_id(genre_abbr: str, artist_num: int, album_letter: str):
 
 class Song(SQLBase):
     __tablename__ = "song"
+    __table_args__ = (Index('song_album_number_index', 'album_id', 'number'),)
 
     class FCC_STATUS:
         CLEAN = 1
@@ -46,6 +43,7 @@ class Song(SQLBase):
     last_played = Column(DateTime, nullable=False)
     times_played = Column(Integer, nullable=False)
     recommended = Column(Boolean, nullable=False)
+    ref = Column(String, nullable=False, index=True)  # Materialized, kept up to date by klap4.db_entities.
 
     album = relationship("klap4.db_entities.album.Album", back_populates="songs")
 
@@ -79,10 +77,6 @@ class Song(SQLBase):
 
         super().__init__(**kwargs)
 
-    @property
-    def ref(self):
-        return self.album.ref + str(self.number)
-
     def __repr__(self):
         return f"<Song(ref={self.ref}, " \
                      f"name={self.name}, " \
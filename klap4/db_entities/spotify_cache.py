@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+from datetime import datetime
+from json import dumps, loads
+from typing import Callable, Tuple, Union
+
+from sqlalchemy import Column, UniqueConstraint, Boolean, DateTime, Integer, String
+from sqlalchemy.exc import IntegrityError
+
+import klap4.db
+from klap4.config import config
+from klap4.db_entities import SQLBase
+from klap4.utils.single_flight import single_flight
+from klap4.utils.spotify_utils import getAlbumCover, getArtistMetadata, SpotifyUnavailableError
+
+
+def normalize_spotify_key(name: Union[str, None]) -> str:
+    """Folds case and whitespace so "The  Cure" and "the cure" share a cache row."""
+    return ' '.join((name or "").casefold().split())
+
+
+class SpotifyCache(SQLBase):
+    __tablename__ = "spotify_cache"
+    __table_args__ = (UniqueConstraint('artist_key', 'album_key', name='spotify_cache_constraint'),)
+
+    id = Column(Integer, primary_key=True)
+    artist_key = Column(String, nullable=False)
+    album_key = Column(String, nullable=False)  # Empty for the artist level row.
+    image_url = Column(String, nullable=True)
+    related_artists = Column(String, nullable=True)  # Raw JSON payload from Spotify.
+    found = Column(Boolean, nullable=False)
+    fetched_at = Column(DateTime, nullable=False)
+
+    @property
+    def is_fresh(self) -> bool:
+        ttl = config.config()["spotifyCacheTTL" if self.found else "spotifyNegativeCacheTTL"]
+        return datetime.now() - self.fetched_at < ttl
+
+    def __repr__(self):
+        return f"<SpotifyCache(id={self.id}, " \
+                             f"artist_key={self.artist_key}, " \
+                             f"album_key={self.album_key}, " \
+                             f"found={self.found}, " \
+                             f"fetched_at={self.fetched_at})>"
+
+
+def _cached_spotify_row(artist_name: str, album_name: Union[str, None], fetch: Callable[[], dict]) -> tuple:
+    """Reads the cache row for an artist (or an album of theirs), only calling ``fetch`` if it is missing or stale.
+
+    The row is written from its own session so that filling the cache never commits (and expires) whatever the caller
+    has loaded in the request's session. If Spotify is unavailable a stale row is served as is, and nothing is written.
+
+    Returns:
+        The row's ``(image_url, related_artists)``.
+    """
+    session = klap4.db.Session.session_factory()
+    try:
+        artist_key = normalize_spotify_key(artist_name)
+        album_key = normalize_spotify_key(album_name)
+
+        entry = session.query(SpotifyCache) \
+            .filter(SpotifyCache.artist_key == artist_key,
+                    SpotifyCache.album_key == album_key) \
+            .one_or_none()
+
+        if entry is not None and entry.is_fresh:
+            return entry.image_url, entry.related_artists
+
+        try:
+            fields = fetch()
+        except SpotifyUnavailableError:
+            if entry is None:
+                return None, None
+            return entry.image_url, entry.related_artists
+
+        if entry is None:
+            entry = SpotifyCache(artist_key=artist_key, album_key=album_key)
+            session.add(entry)
+
+        entry.image_url = fields.get("image_url", None)
+        entry.related_artists = fields.get("related_artists", None)
+        entry.found = entry.image_url is not None or entry.related_artists is not None
+        entry.fetched_at = datetime.now()
+
+        cached = entry.image_url, entry.related_artists
+        try:
+            session.commit()
+        except IntegrityError:
+            # Another process (or a caller that single flight gave up on) cached the same key in the meantime.
+            session.rollback()
+            entry = session.query(SpotifyCache) \
+                .filter(SpotifyCache.artist_key == artist_key,
+                        SpotifyCache.album_key == album_key) \
+                .one_or_none()
+            if entry is not None:
+                return entry.image_url, entry.related_artists
+
+        return cached
+    finally:
+        session.close()
+
+
+@single_flight
+def get_album_cover(album_name: str, artist_name: str) -> Union[str, None]:
+    """Cached ``getAlbumCover``."""
+    image_url, _ = _cached_spotify_row(artist_name, album_name,
+                                       lambda: {"image_url": getAlbumCover(album_name, artist_name)})
+    return image_url
+
+
+@single_flight
+def get_artist_metadata(artist_name: str) -> Tuple[Union[str, None], Union[dict, None]]:
+    """Cached ``getArtistMetadata``, returned as ``(image_url, related_artists)``."""
+    def fetch() -> dict:
+        image_url, related_artists = getArtistMetadata(artist_name)
+        return {
+            "image_url": image_url,
+            "related_artists": None if related_artists is None else dumps(related_artists)
+        }
+
+    image_url, related_artists = _cached_spotify_row(artist_name, None, fetch)
+    return image_url, None if related_artists is None else loads(related_artists)
@@ -1,5 +1,5 @@
 from klap4.resources.artist import ArtistListAPI, ArtistAPI
 from klap4.resources.album import AlbumListAPI, AlbumAPI, AlbumReviewAPI
-from klap4.resources.charts import ChartsAPI
+from klap4.resources.charts import ChartsAPI, MultiWindowChartsAPI, ChartExportAPI
 from klap4.resources.playlist import PlaylistAPI, PlaylistEntryAPI
 from klap4.resources.song import SongAPI
\ No newline at end of file
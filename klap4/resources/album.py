@@ -2,10 +2,17 @@ from flask import request, jsonify
 from flask_restful import Resource
 
 from klap4.db_entities import get_entity_from_tag
+from klap4.db_entities.album import album_display_options
 from klap4.services.album_services import new_album_list, search_albums, add_review
+from klap4.services.album_services import iter_new_albums, iter_search_albums, search_albums_page, count_search_albums
+from klap4.utils.json_utils import stream_requested, stream_json_response
+from klap4.utils.pagination import count_requested, page_requested, page_args, bad_page_request
 
 class AlbumListAPI(Resource):
     def get(self):
+        if stream_requested():
+            return stream_json_response(iter_new_albums())
+
         album_list = new_album_list()
         return jsonify(album_list)
     
@@ -14,13 +21,27 @@ class AlbumListAPI(Resource):
         genre = json_data['genre']
         artist = json_data['artistName']
         name = json_data['name']
+
+        if count_requested():
+            return jsonify(count=count_search_albums(genre, artist, name))
+
+        if page_requested():
+            try:
+                limit, cursor = page_args()
+                return jsonify(search_albums_page(genre, artist, name, limit=limit, cursor=cursor))
+            except ValueError:
+                return bad_page_request()
+
+        if stream_requested():
+            return stream_json_response(iter_search_albums(genre, artist, name))
+
         album_list = search_albums(genre, artist, name)
         return jsonify(album_list)
 
 
 class AlbumAPI(Resource):
     def get(self, ref):
-        album = get_entity_from_tag(ref)
+        album = get_entity_from_tag(ref, options=album_display_options())
         serialized_album = album.serialize()
         return serialized_album
 
@@ -3,6 +3,9 @@ from flask_restful import Resource
 
 from klap4.db_entities import get_entity_from_tag
 from klap4.services.artist_services import new_artist_list, search_artists
+from klap4.services.artist_services import iter_search_artists, search_artists_page, count_search_artists
+from klap4.utils.json_utils import stream_requested, stream_json_response
+from klap4.utils.pagination import count_requested, page_requested, page_args, bad_page_request
 
 
 class ArtistListAPI(Resource):
@@ -15,6 +18,20 @@ class ArtistListAPI(Resource):
         json_data = request.get_json(force=True)
         genre = json_data['genre']
         name = json_data['name']
+
+        if count_requested():
+            return jsonify(count=count_search_artists(genre, name))
+
+        if page_requested():
+            try:
+                limit, cursor = page_args()
+                return jsonify(search_artists_page(genre, name, limit=limit, cursor=cursor))
+            except ValueError:
+                return bad_page_request()
+
+        if stream_requested():
+            return stream_json_response(iter_search_artists(genre, name))
+
         artist_list = search_artists(genre, name)
         return jsonify(artist_list)
 
@@ -1,13 +1,43 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 from flask_restful import Resource
 
-from klap4.services.charts_services import generate_chart, charts_format
+from klap4.services.charts_services import get_chart, get_charts, chart_exporters, CHART_WINDOWS
+
+export_mimetypes = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
 
 class ChartsAPI(Resource):
     def get(self, form, weeks):
         if weeks > 104 or weeks < 1:
             return jsonify(error="Bad request"), 400
         else:
-            charts = generate_chart(form, weeks)
-            charts = charts_format(charts)
-            return jsonify(charts)
\ No newline at end of file
+            charts = get_chart(form, weeks)
+            return jsonify(charts)
+
+
+class MultiWindowChartsAPI(Resource):
+    def get(self, form):
+        try:
+            windows = [int(weeks) for weeks in request.args["weeks"].split(',')] if "weeks" in request.args \
+                else CHART_WINDOWS
+        except ValueError:
+            return {"error": 'Bad Request'}, 400
+
+        if len(windows) == 0 or any(weeks > 104 or weeks < 1 for weeks in windows):
+            return {"error": 'Bad Request'}, 400
+
+        charts = get_charts(form, windows)
+        return jsonify({str(weeks): chart for weeks, chart in charts.items()})
+
+
+class ChartExportAPI(Resource):
+    def get(self, form, weeks, fmt):
+        if weeks > 104 or weeks < 1 or fmt not in chart_exporters:
+            return {"error": 'Bad Request'}, 400
+
+        rows = chart_exporters[fmt](form, weeks)
+        response = Response(stream_with_context(rows), mimetype=export_mimetypes[fmt])
+        response.headers["Content-Disposition"] = f"attachment; filename=chart-{form}-{weeks}.{fmt}"
+        return response
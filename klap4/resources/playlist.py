@@ -3,10 +3,22 @@ from flask_restful import Resource
 
 from klap4.services.playlist_services import list_playlists, add_playlist, update_playlist, delete_playlist
 from klap4.services.playlist_services import display_playlist_entries, add_playlist_entry, update_playlist_entry, delete_playlist_entry
+from klap4.services.playlist_services import list_playlists_page, count_playlists
+from klap4.utils.pagination import count_requested, page_requested, page_args, bad_page_request
 
 
 class PlaylistAPI(Resource):
     def get(self, dj_id):
+        if count_requested():
+            return jsonify(count=count_playlists(dj_id))
+
+        if page_requested():
+            try:
+                limit, cursor = page_args()
+                return jsonify(list_playlists_page(dj_id, limit=limit, cursor=cursor))
+            except ValueError:
+                return bad_page_request()
+
         playlists = list_playlists(dj_id)
         return jsonify(playlists)
     
@@ -2,4 +2,5 @@ from klap4.services.artist_services import *
 from klap4.services.album_services import *
 from klap4.services.charts_services import *
 from klap4.services.playlist_services import *
+from klap4.services.prefetch_services import *
 from klap4.services.program_services import *
\ No newline at end of file
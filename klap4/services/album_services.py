@@ -1,48 +1,63 @@
-from sqlalchemy import func
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from sqlalchemy import func, type_coerce, Boolean
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql.expression import and_
 
+from klap4.config import config
 from klap4.db_entities import SQLBase, decompose_tag, get_entity_from_tag
 from klap4.db_entities.genre import Genre
 from klap4.db_entities.artist import Artist
 from klap4.db_entities.album import Album, AlbumReview, AlbumProblem
 from klap4.db_entities.song import Song
 from klap4.utils import get_json, format_object_list
+from klap4.utils.json_utils import ColumnSerializer, json
+from klap4.utils.pagination import paginate, page_json
 
 
-def new_album_list() -> list:
-    from datetime import datetime, timedelta
+def _album_list_serializer() -> ColumnSerializer:
+    new_album_limit = datetime.now() - timedelta(days=30*6)
+
+    return ColumnSerializer([
+        Album.ref.label("id"),
+        Album.name,
+        Artist.ref.label("artist_ref"),
+        Artist.name.label("artist"),
+        Genre.name.label("genre"),
+        Album.format_bitfield.label("format"),
+        Album.missing,
+        type_coerce(Album.date_added > new_album_limit, Boolean).label("new_album"),
+    ])
 
+
+def iter_new_albums() -> Iterator[json]:
+    """Yields the new album listing row by row off of a server side cursor."""
     from klap4.db import Session
     session = Session()
 
     new_album_limit = datetime.now() - timedelta(days=30*6)
 
-    new_album_list = session.query(Album) \
-        .filter(Album.date_added > new_album_limit).all()
-    
-    serialized_list = []
+    serializer = _album_list_serializer()
+    new_album_list = serializer.query(session) \
+        .select_from(Album) \
+        .join(Album.artist) \
+        .join(Artist.genre) \
+        .filter(Album.date_added > new_album_limit) \
+        .execution_options(stream_results=True) \
+        .yield_per(config.config()["streamChunkSize"])
+
     for album in new_album_list:
-        serialized_album = {
-                            "id": album.ref,
-                            "name": album.name,
-                            "artist_ref": album.artist.ref,
-                            "artist": album.artist.name,
-                            "genre": album.artist.genre.name,
-                            "format": album.format_bitfield,
-                            "missing": album.missing,
-                            "new_album": album.is_new,
-                            }
-        serialized_list.append(serialized_album)
+        yield serializer(album)
 
-    return serialized_list
 
+def new_album_list() -> list:
+    return list(iter_new_albums())
 
-def search_albums(genre: str, artist_name: str, name: str) -> list:
-    from klap4.db import Session
-    session = Session()
 
-    album_list = session.query(Album) \
+def _search_albums_query(session, serializer: ColumnSerializer, genre: str, artist_name: str, name: str):
+    return serializer.query(session) \
+        .select_from(Album) \
         .join(Artist, and_(Artist.id == Album.artist_id, Artist.name.like(artist_name+'%'))
         ) \
         .join(
@@ -50,24 +65,45 @@ def search_albums(genre: str, artist_name: str, name: str) -> list:
         ) \
         .filter(
             Album.name.like(name+'%'),
-        ) \
-        .all()
+        )
+
+
+def iter_search_albums(genre: str, artist_name: str, name: str) -> Iterator[json]:
+    """Yields the album search results row by row off of a server side cursor."""
+    from klap4.db import Session
+    session = Session()
+
+    serializer = _album_list_serializer()
+    album_list = _search_albums_query(session, serializer, genre, artist_name, name) \
+        .execution_options(stream_results=True) \
+        .yield_per(config.config()["streamChunkSize"])
 
-    serialized_list = []
     for album in album_list:
-        serialized_album = {
-                            "id": album.ref,
-                            "name": album.name,
-                            "artist_ref": album.artist.ref,
-                            "artist": album.artist.name,
-                            "genre": album.artist.genre.name,
-                            "format": album.format_bitfield,
-                            "missing": album.missing,
-                            "new_album": album.is_new,
-                            }
-        serialized_list.append(serialized_album)
-
-    return serialized_list
+        yield serializer(album)
+
+
+def search_albums(genre: str, artist_name: str, name: str) -> list:
+    return list(iter_search_albums(genre, artist_name, name))
+
+
+def search_albums_page(genre: str, artist_name: str, name: str, *, limit: int, cursor: str = None) -> dict:
+    """One page of album search results, ordered by genre, artist number and album letter."""
+    from klap4.db import Session
+    session = Session()
+
+    serializer = _album_list_serializer()
+    album_list, next_cursor = paginate(_search_albums_query(session, serializer, genre, artist_name, name),
+                                       (Genre.abbreviation, Artist.number, Album.letter),
+                                       limit=limit, cursor=cursor)
+
+    return page_json(serializer.format_rows(album_list), next_cursor)
+
+
+def count_search_albums(genre: str, artist_name: str, name: str) -> int:
+    from klap4.db import Session
+    session = Session()
+
+    return _search_albums_query(session, ColumnSerializer([Album.id]), genre, artist_name, name).count()
 
 
 def add_review(album_ref: str, dj_id: str, content: str) -> SQLBase:
@@ -1,12 +1,17 @@
+from typing import Iterator
+
 from sqlalchemy import func
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql.expression import and_
 
+from klap4.config import config
 from klap4.db_entities import SQLBase, decompose_tag
 from klap4.db_entities.genre import Genre
 from klap4.db_entities.artist import Artist
 from klap4.db_entities.album import Album
 from klap4.utils import *
+from klap4.utils.json_utils import ColumnSerializer, json
+from klap4.utils.pagination import paginate, page_json
 
 
 def new_artist_list():
@@ -35,26 +40,56 @@ def new_artist_list():
             
 
 
-def search_artists(genre: str, name: str) -> list:
-    from klap4.db import Session
-    session = Session()
+# Column-only serializer for artist listings.
+_artist_list_serializer = ColumnSerializer([
+    Artist.ref.label("id"),
+    Artist.name,
+    Genre.name.label("genre"),
+])
+
 
-    artist_list = session.query(Artist) \
+def _search_artists_query(session, genre: str, name: str):
+    return _artist_list_serializer.query(session) \
+        .select_from(Artist) \
         .join(
             Genre, and_(Genre.id == Artist.genre_id, Genre.name.like(genre+'%'))
         ) \
         .filter(
             Artist.name.like(name+'%')
-        ) \
-        .all()
-    
-    serialized_list = []
+        )
+
+
+def iter_search_artists(genre: str, name: str) -> Iterator[json]:
+    """Yields the artist search results row by row off of a server side cursor."""
+    from klap4.db import Session
+    session = Session()
+
+    artist_list = _search_artists_query(session, genre, name) \
+        .execution_options(stream_results=True) \
+        .yield_per(config.config()["streamChunkSize"])
+
     for artist in artist_list:
-        serialized_artist = {
-                                "id": artist.ref,
-                                "name": artist.name,
-                                "genre": artist.genre.name
-                            }
-        serialized_list.append(serialized_artist)
-    
-    return serialized_list
\ No newline at end of file
+        yield _artist_list_serializer(artist)
+
+
+def search_artists(genre: str, name: str) -> list:
+    return list(iter_search_artists(genre, name))
+
+
+def search_artists_page(genre: str, name: str, *, limit: int, cursor: str = None) -> dict:
+    """One page of artist search results, ordered by genre and artist number."""
+    from klap4.db import Session
+    session = Session()
+
+    artist_list, next_cursor = paginate(_search_artists_query(session, genre, name),
+                                        (Genre.abbreviation, Artist.number),
+                                        limit=limit, cursor=cursor)
+
+    return page_json(_artist_list_serializer.format_rows(artist_list), next_cursor)
+
+
+def count_search_artists(genre: str, name: str) -> int:
+    from klap4.db import Session
+    session = Session()
+
+    return _search_artists_query(session, genre, name).count()
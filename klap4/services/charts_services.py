@@ -1,83 +1,360 @@
-from sqlalchemy import func, desc
-from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.sql.expression import and_
+import csv
+from datetime import datetime, timedelta
+from io import StringIO
+from json import dumps
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+import sqlalchemy
+from sqlalchemy import event, func, desc
+from sqlalchemy.orm import object_session
+
+from klap4.config import config
 
-from klap4.db_entities import SQLBase, decompose_tag, get_entity_from_tag
 from klap4.db_entities.genre import Genre
 from klap4.db_entities.artist import Artist
-from klap4.db_entities.album import find_album, Album, AlbumReview, AlbumProblem
+from klap4.db_entities.album import Album
 from klap4.db_entities.song import Song
-from klap4.utils import get_json, format_object_list
+from klap4.db_entities.label_and_promoter import Label, Promoter
+from klap4.db_entities.play_history import week_start, AlbumWeeklyPlays, PlayEvent
+from klap4.utils.cache import LRUCache
+from klap4.utils.json_utils import ColumnSerializer
+from klap4.utils.single_flight import single_flight
+
+
+def _chart_query(session, format: str, weeks: int, columns: tuple):
+    """The ranked GROUP BY album query behind a chart, selecting ``columns`` and then the album's plays.
+
+    Returns ``None`` for an unknown chart format.
+    """
+    window_start = week_start(datetime.now()) - timedelta(weeks=int(weeks) - 1)
+    new_album_limit = datetime.now() - timedelta(days=30*6)
 
+    total_plays = func.sum(AlbumWeeklyPlays.plays)
+    chart_query = session.query(*columns, total_plays) \
+        .select_from(AlbumWeeklyPlays) \
+        .join(Album, Album.id == AlbumWeeklyPlays.album_id) \
+        .join(Artist, Artist.id == Album.artist_id) \
+        .join(Genre, Genre.id == Artist.genre_id) \
+        .outerjoin(Label, Label.id == Album.label_id) \
+        .outerjoin(Promoter, Promoter.id == Album.promoter_id) \
+        .filter(AlbumWeeklyPlays.week_start >= window_start)
 
+    if format == "new":
+        chart_query = chart_query.filter(Album.date_added > new_album_limit)
+    elif format != "all":
+        return None
 
+    return chart_query \
+        .group_by(Album.id, Genre.abbreviation, Artist.number, Album.letter, *columns) \
+        .order_by(desc(total_plays), Genre.abbreviation, Artist.number, Album.letter)
+
+
+# Single flight so a burst of requests for the same chart only runs the aggregation once.
+@single_flight
 def generate_chart(format: str, weeks: int) -> list:
-    from datetime import datetime, timedelta
+    """Ranks the albums by how many times they were played in the last ``weeks`` weeks.
+
+    Plays are summed from the weekly rollups (the current week and the ``weeks - 1`` before it), so a chart reads at
+    most ``weeks`` small rows per album in a single GROUP BY album query rather than the raw play history.
 
+    The weeks are calendar weeks starting on Monday, not the trailing ``weeks * 7`` days charts used to cover: a one
+    week chart on a Wednesday only counts Monday through Wednesday, and every chart rolls over on Monday.
+
+    Returns:
+        ``(genre_abbr, artist_num, album_letter, plays)`` tuples, most played first.
+    """
     from klap4.db import Session
     session = Session()
 
-    chart_list = None
+    chart_query = _chart_query(session, format, weeks, (Genre.abbreviation, Artist.number, Album.letter))
+    if chart_query is None:
+        return []
+
+    return [tuple(chart) for chart in chart_query.all()]
+
 
-    weeks_ago = datetime.now() - timedelta(weeks=int(weeks))
+# The windows station reporting asks for, in weeks.
+CHART_WINDOWS = (1, 4, 13, 26, 52, 104)
+
+
+@single_flight
+def generate_charts(format: str, windows: Iterable[int] = CHART_WINDOWS) -> Dict[int, list]:
+    """Ranks the albums for several windows at once, the result for each window is the same as ``generate_chart``'s.
+
+    The weekly rollups of the widest window are read once into an album by week matrix, newest week first. A cumulative
+    sum along the weeks then holds every window's totals at once: column ``weeks - 1`` is the ``weeks`` week chart.
+    """
+    from klap4.db import Session
+    session = Session()
+
+    windows = tuple(sorted(set(int(weeks) for weeks in windows)))
+    current_week = week_start(datetime.now())
+    window_start = current_week - timedelta(weeks=windows[-1] - 1)
     new_album_limit = datetime.now() - timedelta(days=30*6)
 
-    if format == "all":
-        chart_list = session.query(Song, func.sum(Song.times_played)) \
-            .filter(Song.last_played > weeks_ago
-            ) \
-            .group_by(Song.id
-            ) \
-            .all()
-        
-    elif format == "new":
-        chart_list = session.query(Song, func.sum(Song.times_played)) \
-            .join(Album, and_(Album.date_added > new_album_limit, Song.album_id == Album.id)) \
-            .filter(Song.last_played > weeks_ago) \
-            .group_by(Song.id) \
-            .all()
-    
-    better_charts = []
-    ref_list = []
-
-    for item in chart_list:
-        genre_abbr = decompose_tag(item[0].ref).genre_abbr
-        artist_num = decompose_tag(item[0].ref).artist_num
-        album_letter = decompose_tag(item[0].ref).album_letter
-        ref = genre_abbr + str(artist_num) + album_letter
-        album = get_entity_from_tag(ref)
-        if ref in ref_list:
-            continue
-        else:
-            total_plays = album.total_plays
-            better_charts.append((genre_abbr, artist_num, album_letter, total_plays))
-            ref_list.append(ref)
-    
-    sorted_charts = sorted(better_charts, key=lambda x:(-x[3], x[0], x[1], x[2]))
-    return sorted_charts
+    rollup_query = session.query(Album.id, Genre.abbreviation, Artist.number, Album.letter,
+                                 AlbumWeeklyPlays.week_start, AlbumWeeklyPlays.plays) \
+        .select_from(AlbumWeeklyPlays) \
+        .join(Album, Album.id == AlbumWeeklyPlays.album_id) \
+        .join(Artist, Artist.id == Album.artist_id) \
+        .join(Genre, Genre.id == Artist.genre_id) \
+        .filter(AlbumWeeklyPlays.week_start >= window_start)
+
+    if format == "new":
+        rollup_query = rollup_query.filter(Album.date_added > new_album_limit)
+    elif format != "all":
+        return {weeks: [] for weeks in windows}
+
+    # Ordered by the chart's tie breakers, so a stable sort on plays alone ranks them the same as generate_chart.
+    rollups = rollup_query.order_by(Genre.abbreviation, Artist.number, Album.letter).all()
+
+    if len(rollups) == 0:
+        return {weeks: [] for weeks in windows}
+
+    album_ids, genre_abbrs, artist_nums, album_letters, rollup_weeks, rollup_plays = zip(*rollups)
+    plays = np.array(rollup_plays, dtype=np.int64)
+    week_indices = np.maximum(0, (np.datetime64(current_week, "D") -
+                                  np.array(rollup_weeks, dtype="datetime64[D]")).astype(np.int64) // 7)
+
+    # Each album gets a matrix row, numbered by where it first shows up so the rows keep the tie breaker order.
+    _, first_rows, album_indices = np.unique(np.array(album_ids, dtype=np.int64), return_index=True,
+                                             return_inverse=True)
+    album_order = np.argsort(first_rows)
+    row_numbers = np.empty(len(album_order), dtype=np.int64)
+    row_numbers[album_order] = np.arange(len(album_order))
+    row_indices = row_numbers[album_indices.reshape(-1)]
+    albums = [(genre_abbrs[i], artist_nums[i], album_letters[i]) for i in first_rows[album_order]]
+
+    weekly_plays = np.zeros((len(albums), windows[-1]), dtype=np.int64)
+    np.add.at(weekly_plays, (row_indices, week_indices), plays)
+    window_plays = np.cumsum(weekly_plays, axis=1)
+
+    charts = {}
+    for weeks in windows:
+        totals = window_plays[:, weeks - 1]
+        ranking = np.argsort(-totals, kind="stable")
+        ranking = ranking[totals[ranking] > 0]
+        charts[weeks] = [albums[row] + (int(plays),) for row, plays in zip(ranking, totals[ranking])]
+
+    return charts
+
+
+# Everything a formatted chart row shows about its album, read in one go without loading any ORM instances.
+_chart_album_serializer = ColumnSerializer([
+    Album.ref,
+    Genre.name.label("genre"),
+    Artist.name.label("artist_name"),
+    Album.name.label("album_name"),
+    Label.name.label("label_name"),
+    Promoter.name.label("promoter_name"),
+])
+
+# Album refs per IN clause, well under SQLite's limit of 999 bound parameters.
+_CHART_ALBUM_CHUNK_SIZE = 500
 
 
 def charts_format(chart_list):
-    formatted_list = []
-    for entry in chart_list:
-        genre_tag = entry[0]
-        artist_tag = genre_tag + str(entry[1])
-        album_tag = artist_tag + entry[2]
+    from klap4.db import Session
+    session = Session()
 
-        genre = get_entity_from_tag(genre_tag)
-        artist = get_entity_from_tag(artist_tag)
-        album = get_entity_from_tag(album_tag)
+    album_refs = [entry[0] + str(entry[1]) + entry[2] for entry in chart_list]
+
+    albums = {}
+    for i in range(0, len(album_refs), _CHART_ALBUM_CHUNK_SIZE):
+        album_rows = _chart_album_serializer.query(session) \
+            .select_from(Album) \
+            .join(Artist, Artist.id == Album.artist_id) \
+            .join(Genre, Genre.id == Artist.genre_id) \
+            .outerjoin(Label, Label.id == Album.label_id) \
+            .outerjoin(Promoter, Promoter.id == Album.promoter_id) \
+            .filter(Album.ref.in_(album_refs[i:i + _CHART_ALBUM_CHUNK_SIZE]))
+
+        for album in _chart_album_serializer.format_rows(album_rows):
+            albums[album["ref"]] = album
+
+    formatted_list = []
+    for entry, album_ref in zip(chart_list, album_refs):
+        album = albums.get(album_ref, None)
+        if album is None:  # Deleted since the chart was ranked.
+            continue
 
         formatted_album = {
-                    "album_id": album_tag,
-                    "rank": chart_list.index(entry)+1,
-                    "genre": genre.name,
-                    "artist_name": artist.name,
-                    "album_name": album.name,
-                    "label_name": None if album.label_id is None else album.label.name,
-                    "promoter_name": None if album.promoter_id is None else album.promoter.name,
+                    "album_id": album_ref,
+                    "rank": len(formatted_list) + 1,
+                    "genre": album["genre"],
+                    "artist_name": album["artist_name"],
+                    "album_name": album["album_name"],
+                    "label_name": album["label_name"],
+                    "promoter_name": album["promoter_name"],
                     "times_played": entry[3]
         }
         formatted_list.append(formatted_album)
     
-    return formatted_list
\ No newline at end of file
+    return formatted_list
+
+
+def get_charts(form: str, windows: Iterable[int] = CHART_WINDOWS) -> Dict[int, List[dict]]:
+    """The formatted chart of every window, formatted off of a single batched album query."""
+    charts = generate_charts(form, tuple(windows))
+
+    # Every album charting in a narrower window also charts in the widest one.
+    albums = {album["album_id"]: album for album in charts_format(charts[max(charts)])}
+
+    formatted_charts = {}
+    for weeks, chart_list in charts.items():
+        formatted_charts[weeks] = []
+        for entry in chart_list:
+            album = albums.get(entry[0] + str(entry[1]) + entry[2], None)
+            if album is None:  # Deleted since the chart was ranked.
+                continue
+
+            formatted_album = dict(album)
+            formatted_album["rank"] = len(formatted_charts[weeks]) + 1
+            formatted_album["times_played"] = entry[3]
+            formatted_charts[weeks].append(formatted_album)
+
+    return formatted_charts
+
+
+# Columns of a chart export, in order.
+CHART_EXPORT_FIELDS = ("rank", "album_id", "genre", "artist_name", "album_name", "label_name", "promoter_name",
+                       "times_played")
+
+
+def iter_chart_export(form: str, weeks: int) -> Iterator[dict]:
+    """Yields a chart's rows off of a server side cursor, already formatted and with every export column.
+
+    Unlike ``charts_format`` the chart is never built as a list, so long historical exports stay flat in memory.
+    """
+    from klap4.db import Session
+    session = Session()
+
+    chart_query = _chart_query(session, form, weeks, (Album.ref, Genre.name, Artist.name, Album.name, Label.name,
+                                                      Promoter.name))
+    if chart_query is None:
+        return
+
+    chart_rows = chart_query \
+        .execution_options(stream_results=True) \
+        .yield_per(config.config()["streamChunkSize"])
+
+    for rank, row in enumerate(chart_rows, start=1):
+        yield dict(zip(CHART_EXPORT_FIELDS, (rank, *row)))
+
+
+def iter_chart_csv(form: str, weeks: int) -> Iterator[str]:
+    """The chart export as CSV, a header line and then a line per album."""
+    line = StringIO()
+    writer = csv.DictWriter(line, fieldnames=CHART_EXPORT_FIELDS, lineterminator="\n")
+
+    writer.writeheader()
+    for row in iter_chart_export(form, weeks):
+        writer.writerow(row)
+        if line.tell() >= 8192:
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+
+    yield line.getvalue()
+
+
+def iter_chart_ndjson(form: str, weeks: int) -> Iterator[str]:
+    """The chart export as newline delimited JSON, an object per album."""
+    for row in iter_chart_export(form, weeks):
+        yield dumps(row) + "\n"
+
+
+chart_exporters = {
+    "csv": iter_chart_csv,
+    "ndjson": iter_chart_ndjson,
+}
+
+
+class ChartSnapshotCache:
+    """Formatted charts keyed by ``(form, weeks, week_start)``, so every chart rolls over on its own each Monday.
+
+    Every cached chart is dropped whenever a play is logged (or a charted album, artist, genre, label or promoter is
+    edited). A chart computed while that happened is not stored, so a snapshot can never be older than the last write.
+    """
+
+    def __init__(self, maxsize: int):
+        self._snapshots = LRUCache(maxsize)
+        self._generation = 0
+        self._lock = Lock()
+
+    def get(self, form: str, weeks: int):
+        return self._snapshots.get((form, int(weeks), week_start(datetime.now())), None)
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def put(self, form: str, weeks: int, chart: list, generation: int) -> None:
+        with self._lock:
+            if generation == self._generation:
+                self._snapshots.put((form, int(weeks), week_start(datetime.now())), chart)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._snapshots.clear()
+
+
+chart_snapshots = ChartSnapshotCache(config.config()["chartCacheSize"])
+
+
+@single_flight
+def _build_chart_snapshot(form: str, weeks: int) -> Tuple[int, list]:
+    """Formats a chart along with the snapshot generation it was read at.
+
+    The generation is read inside the flight and before the chart is, so a caller that joins a flight started before a
+    play was logged gets back that flight's older generation and the chart is not stored. ``generate_chart`` is called
+    past its own single flight for the same reason.
+    """
+    generation = chart_snapshots.generation()
+    return generation, charts_format(generate_chart.__wrapped__(form, weeks))
+
+
+def get_chart(form: str, weeks: int) -> list:
+    """The formatted chart, served from the snapshot cache until the next play is logged."""
+    chart = chart_snapshots.get(form, weeks)
+    if chart is None:
+        generation, chart = _build_chart_snapshot(form, weeks)
+        chart_snapshots.put(form, weeks, chart, generation)
+
+    return chart
+
+
+def _invalidate_charts(mapper, connection, target) -> None:
+    chart_snapshots.invalidate()
+
+    # Also once the write commits, in case a chart was rebuilt from the old data in the meantime.
+    session = object_session(target)
+    if session is not None:
+        session.info["charts_stale"] = True
+
+
+def _invalidate_charts_if_played(mapper, connection, target) -> None:
+    if sqlalchemy.inspect(target).attrs.times_played.history.has_changes():
+        _invalidate_charts(mapper, connection, target)
+
+
+@event.listens_for(sqlalchemy.orm.Session, "after_commit")
+def _invalidate_charts_after_commit(session) -> None:
+    if session.info.pop("charts_stale", False):
+        chart_snapshots.invalidate()
+
+
+@event.listens_for(sqlalchemy.orm.Session, "after_soft_rollback")
+def _forget_stale_charts(session, previous_transaction) -> None:
+    session.info.pop("charts_stale", None)
+
+
+event.listen(PlayEvent, "after_insert", _invalidate_charts)
+event.listen(AlbumWeeklyPlays, "after_insert", _invalidate_charts)
+event.listen(Song, "after_update", _invalidate_charts_if_played)
+for _entity_type in (Genre, Artist, Album, Label, Promoter):
+    event.listen(_entity_type, "after_update", _invalidate_charts)
+    event.listen(_entity_type, "after_delete", _invalidate_charts)
@@ -6,18 +6,39 @@ from klap4.db_entities import SQLBase, decompose_tag
 from klap4.db_entities.album import Album
 from klap4.db_entities.artist import Artist
 from klap4.db_entities.dj import DJ
-from klap4.db_entities.playlist import Playlist, PlaylistEntry
+from klap4.db_entities.play_history import record_play
+from klap4.db_entities.playlist import Playlist, PlaylistEntry, playlist_serializer, playlist_entry_serializer
 from klap4.db_entities.song import Song
 from klap4.utils import *
+from klap4.utils.pagination import paginate, page_json
 
 def list_playlists(dj_id: str) -> list:
     from klap4.db import Session
     session = Session()
 
-    playlists = session.query(Playlist) \
-        .filter(Playlist.dj_id == dj_id).all()
+    playlists = playlist_serializer.query(session) \
+        .filter(Playlist.dj_id == dj_id)
     
-    return format_object_list(playlists)
+    return playlist_serializer.format_rows(playlists)
+
+
+def list_playlists_page(dj_id: str, *, limit: int, cursor: str = None) -> dict:
+    """One page of a DJ's playlists, ordered by name."""
+    from klap4.db import Session
+    session = Session()
+
+    playlists, next_cursor = paginate(playlist_serializer.query(session).filter(Playlist.dj_id == dj_id),
+                                      (Playlist.name,),
+                                      limit=limit, cursor=cursor)
+
+    return page_json(playlist_serializer.format_rows(playlists), next_cursor)
+
+
+def count_playlists(dj_id: str) -> int:
+    from klap4.db import Session
+    session = Session()
+
+    return playlist_serializer.query(session).filter(Playlist.dj_id == dj_id).count()
 
 
 def add_playlist(dj_id: str, name: str, show: str) -> SQLBase:
@@ -77,20 +98,18 @@ def display_playlist_entries(dj_id: str, p_name: str) -> SQLBase:
     session = Session()
 
     try:
-        u_playlist = session.query(Playlist) \
+        u_playlist = playlist_serializer.query(session) \
             .filter(and_(Playlist.dj_id == dj_id, Playlist.name == p_name)).one()
     except:
         return {"error": "ERROR"}
     
-    playlist = get_json(u_playlist)
+    playlist = playlist_serializer(u_playlist)
     
-    playlist_entries = session.query(PlaylistEntry) \
-        .join(Playlist, and_(Playlist.id == PlaylistEntry.playlist_id, Playlist.name == p_name)) \
-        .join(DJ, and_(DJ.id == Playlist.dj_id, DJ.id == dj_id)) \
-        .order_by(PlaylistEntry.index) \
-        .all()
+    playlist_entries = playlist_entry_serializer.query(session) \
+        .filter(PlaylistEntry.playlist_id == playlist["id"]) \
+        .order_by(PlaylistEntry.index)
 
-    info_list = format_object_list(playlist_entries)
+    info_list = playlist_entry_serializer.format_rows(playlist_entries)
 
     obj = {
             "playlist": playlist,
@@ -110,16 +129,19 @@ def add_playlist_entry(dj_id: str, p_name: str, entry) -> SQLBase:
                         .join(Album, and_(Album.id == Song.album_id, Album.name == entry["album"])) \
                         .join(Artist, and_(Artist.id == Album.artist_id, Artist.name == entry["artist"])) \
                         .filter(Song.name == entry["song"]).one()
-        
-        old_times_played = song_entry.times_played
+    except:
+        song_entry = None
+
+    # Logged outside of the lookup, so a failed write isn't mistaken for a song that isn't in the library.
+    if song_entry is not None:
         song_entry.last_played = datetime.now()
-        session.commit()
-        song_entry.times_played = old_times_played + 1
+        song_entry.times_played = song_entry.times_played + 1
+        record_play(session, song_entry, song_entry.last_played)
         session.commit()
 
         reference_type = REFERENCE_TYPE.IN_KLAP4
-        reference = song_entry.album.artist.genre.abbreviation + str(song_entry.album.artist.number) + song_entry.album.letter
-    except:
+        reference = song_entry.album.ref
+    else:
         reference_type = REFERENCE_TYPE.MANUAL
         reference = str(entry)
 
@@ -149,16 +171,18 @@ def update_playlist_entry(dj_id: str, p_name: str, index: int, entry, new_index:
                         .join(Album, and_(Album.id == Song.album_id, Album.name == new_entry["album"])) \
                         .join(Artist, and_(Artist.id == Album.artist_id, Artist.name == new_entry["artist"])) \
                         .filter(Song.name == new_entry["song"]).one()
-            old_times_played = song_entry.times_played
+        except:
+            song_entry = None
 
+        if song_entry is not None:
             song_entry.last_played = datetime.now()
-            session.commit()
-            song_entry.times_played = old_times_played + 1
+            song_entry.times_played = song_entry.times_played + 1
+            record_play(session, song_entry, song_entry.last_played)
             session.commit()
 
             reference_type = REFERENCE_TYPE.IN_KLAP4
-            reference = song_entry.album.artist.genre.abbreviation + str(song_entry.album.artist.number) + song_entry.album.letter
-        except:
+            reference = song_entry.album.ref
+        else:
             reference_type = REFERENCE_TYPE.MANUAL
             reference = str(new_entry)
         
@@ -0,0 +1,118 @@
+import logging
+from queue import Full, Empty, Queue
+from threading import Event, Lock, Thread
+import time
+from typing import Tuple
+
+from sqlalchemy import event, select
+
+from klap4.config import config
+from klap4.db_entities.artist import Artist
+from klap4.db_entities.album import Album
+from klap4.db_entities.spotify_cache import get_album_cover, get_artist_metadata
+
+
+prefetch_logger = logging.getLogger("prefetch_logger")
+
+
+class ArtworkPrefetcher:
+    """Background worker that warms the Spotify cache for new stock before anyone opens it.
+
+    Lookups are queued as ``("album", album_name, artist_name)`` or ``("artist", artist_name)`` and handed to Spotify at
+    no more than ``prefetchRate`` a second. Every ``prefetchSweepInterval`` the new album listing is queued again, so
+    its entries are refreshed as their cache TTL runs out.
+    """
+
+    def __init__(self):
+        self._queue = Queue(maxsize=config.config()["prefetchQueueSize"])
+        self._pending = set()
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, name="klap4-artwork-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def enqueue(self, key: Tuple[str, ...]) -> bool:
+        """Queues a lookup, skipping ones already waiting. Returns ``False`` if the queue is full."""
+        with self._lock:
+            if key in self._pending:
+                return True
+            try:
+                self._queue.put_nowait(key)
+            except Full:
+                return False
+            self._pending.add(key)
+            return True
+
+    def sweep(self) -> None:
+        """Queues the artwork for every album in the new album listing along with its artist."""
+        from klap4.services.album_services import iter_new_albums
+
+        for album in iter_new_albums():
+            self.enqueue(("album", album["name"], album["artist"]))
+            self.enqueue(("artist", album["artist"]))
+
+    def _fetch(self, key: Tuple[str, ...]) -> None:
+        if key[0] == "album":
+            get_album_cover(key[1], key[2])
+        else:
+            get_artist_metadata(key[1])
+
+    def _run(self) -> None:
+        import klap4.db
+
+        next_sweep = time.monotonic()
+        while not self._stopped.is_set():
+            try:
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + config.config()["prefetchSweepInterval"].total_seconds()
+                    self.sweep()
+
+                try:
+                    key = self._queue.get(timeout=1)
+                except Empty:
+                    continue
+
+                with self._lock:
+                    self._pending.discard(key)
+
+                self._fetch(key)
+            except Exception:
+                prefetch_logger.exception("Artwork prefetch failed.")
+            finally:
+                if klap4.db.is_connected():
+                    klap4.db.Session.remove()
+
+            self._stopped.wait(1 / config.config()["prefetchRate"])
+
+
+artwork_prefetcher = ArtworkPrefetcher()
+
+
+@event.listens_for(Artist, "after_insert")
+def _prefetch_artist(mapper, connection, target) -> None:
+    if artwork_prefetcher.is_running:
+        artwork_prefetcher.enqueue(("artist", target.name))
+
+
+@event.listens_for(Album, "after_insert")
+def _prefetch_album(mapper, connection, target) -> None:
+    if artwork_prefetcher.is_running:
+        artist_name = connection.execute(select([Artist.name]).where(Artist.id == target.artist_id)).scalar()
+        artwork_prefetcher.enqueue(("album", target.name, artist_name))
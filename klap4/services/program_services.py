@@ -1,29 +1,72 @@
+from typing import Iterator
+
 from sqlalchemy import func, extract
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql.expression import and_, or_
 
 
+from klap4.config import config
 from klap4.db_entities import SQLBase
 from klap4.db_entities.program import ProgramFormat, Program
-from klap4.db_entities.program import ProgramLogEntry
-from klap4.db_entities.program import ProgramSlot
-from klap4.utils.json_utils import format_object_list
+from klap4.db_entities.program import ProgramLogEntry, program_log_entry_serializer
+from klap4.db_entities.program import ProgramSlot, program_slot_serializer
+from klap4.utils.json_utils import ColumnSerializer, format_object_list, json
+from klap4.utils.pagination import paginate, page_json
+
+# Column-only serializer matching Program.serialize.
+_program_list_serializer = ColumnSerializer(
+    [
+        ProgramFormat.type,
+        Program.name,
+        Program.duration,
+        Program.months,
+    ],
+    {"duration": lambda program: str(program["duration"])}
+)
+
+
+def _search_programming_query(session, p_type: str, name: str):
+    return _program_list_serializer.query(session) \
+        .select_from(Program) \
+        .join(ProgramFormat, and_(ProgramFormat.id == Program.format_id, ProgramFormat.type.like(p_type+'%'))) \
+        .filter(Program.name.like(name+'%')
+        )
+
 
-def search_programming(p_type: str, name: str) -> SQLBase:
+def iter_search_programming(p_type: str, name: str) -> Iterator[json]:
+    """Yields the program search results row by row off of a server side cursor."""
     from klap4.db import Session
     session = Session()
 
-    serialized_list = []
-    program_list = session.query(Program) \
-        .join(ProgramFormat, and_(ProgramFormat.id == Program.format_id, ProgramFormat.type.like(p_type+'%'))) \
-        .filter(Program.name.like(name+'%')
-        ) \
-        .all()
-    
+    program_list = _search_programming_query(session, p_type, name) \
+        .execution_options(stream_results=True) \
+        .yield_per(config.config()["streamChunkSize"])
+
     for program in program_list:
-        serialized_list.append(program.serialize())
-    
-    return serialized_list
+        yield _program_list_serializer(program)
+
+
+def search_programming(p_type: str, name: str) -> list:
+    return list(iter_search_programming(p_type, name))
+
+
+def search_programming_page(p_type: str, name: str, *, limit: int, cursor: str = None) -> dict:
+    """One page of program search results, ordered by program type and name."""
+    from klap4.db import Session
+    session = Session()
+
+    program_list, next_cursor = paginate(_search_programming_query(session, p_type, name),
+                                         (ProgramFormat.type, Program.name),
+                                         limit=limit, cursor=cursor)
+
+    return page_json(_program_list_serializer.format_rows(program_list), next_cursor)
+
+
+def count_search_programming(p_type: str, name: str) -> int:
+    from klap4.db import Session
+    session = Session()
+
+    return _search_programming_query(session, p_type, name).count()
 
 def display_program(prog_typ: str) -> SQLBase:
     from klap4.db import Session
@@ -51,19 +94,19 @@ def get_program_slots():
     elif datetime.today().weekday() == 0:
         ystr = 6 
 
-    tdy_slots = session.query(ProgramSlot) \
-        .filter(ProgramSlot.day == tdy).all()
+    tdy_slots = program_slot_serializer.query(session) \
+        .filter(ProgramSlot.day == tdy)
     
-    ystr_slots = session.query(ProgramSlot) \
-        .filter(ProgramSlot.day == ystr).all()
+    ystr_slots = program_slot_serializer.query(session) \
+        .filter(ProgramSlot.day == ystr)
     
-    tmrw_slots = session.query(ProgramSlot) \
-        .filter(ProgramSlot.day == tmrw).all()
+    tmrw_slots = program_slot_serializer.query(session) \
+        .filter(ProgramSlot.day == tmrw)
 
     program_slots = {
-                        "today": format_object_list(tdy_slots),
-                        "yesterday": format_object_list(ystr_slots),
-                        "tomorrow": format_object_list(tmrw_slots)
+                        "today": program_slot_serializer.format_rows(tdy_slots),
+                        "yesterday": program_slot_serializer.format_rows(ystr_slots),
+                        "tomorrow": program_slot_serializer.format_rows(tmrw_slots)
     }
 
     for category in program_slots.items():
@@ -88,28 +131,25 @@ def get_program_log():
     elif datetime.today().weekday() == 0:
         ystr = 6
 
-    tdy_logs = session.query(ProgramLogEntry) \
+    tdy_logs = program_log_entry_serializer.query(session) \
         .join(
             ProgramSlot, and_(ProgramSlot.id == ProgramLogEntry.slot_id, ProgramSlot.day == tdy)
-        ) \
-        .all()
+        )
     
-    ystr_logs = session.query(ProgramLogEntry) \
+    ystr_logs = program_log_entry_serializer.query(session) \
         .join(
             ProgramSlot, and_(ProgramSlot.id == ProgramLogEntry.slot_id, ProgramSlot.day == ystr)
-        ) \
-        .all()    
+        )
         
-    tmrw_logs = session.query(ProgramLogEntry) \
+    tmrw_logs = program_log_entry_serializer.query(session) \
         .join(
             ProgramSlot, and_(ProgramSlot.id == ProgramLogEntry.slot_id, ProgramSlot.day == tmrw)
-        ) \
-        .all()
+        )
 
     program_log_entries = {
-                            "today": format_object_list(tdy_logs),
-                            "yesterday": format_object_list(ystr_logs),
-                            "tomorrow": format_object_list(tmrw_logs)
+                            "today": program_log_entry_serializer.format_rows(tdy_logs),
+                            "yesterday": program_log_entry_serializer.format_rows(ystr_logs),
+                            "tomorrow": program_log_entry_serializer.format_rows(tmrw_logs)
     }
     
 
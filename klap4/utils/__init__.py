@@ -1,4 +1,10 @@
+from klap4.utils.cache import *
+from klap4.utils.circuit_breaker import *
+from klap4.utils.enrichment import *
+from klap4.utils.http_transport import *
 from klap4.utils.json_utils import *
 from klap4.utils.login_utils import *
+from klap4.utils.pagination import *
 from klap4.utils.reference_metadata import *
+from klap4.utils.single_flight import *
 from klap4.utils.spotify_utils import *
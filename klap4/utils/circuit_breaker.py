@@ -0,0 +1,74 @@
+from threading import Lock
+import time
+from typing import Any, Callable
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling out while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing upstream for a while instead of letting every request wait on it to time out.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and calls fail fast with ``CircuitOpenError``.
+    Once ``reset_timeout`` seconds have passed, a single probe call is let through (half-open): if it succeeds the
+    circuit closes again, otherwise it goes back to open for another ``reset_timeout``.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name: str, *, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            state = self._current_state()
+            if state == self.OPEN or (state == self.HALF_OPEN and self._probing):
+                raise CircuitOpenError(f"Circuit '{self.name}' is open.")
+            if state == self.HALF_OPEN:
+                self._probing = True
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._record_failure()
+            raise
+
+        self._record_success()
+        return result
+
+    def _record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def _record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._state = self.CLOSED
+            self._probing = False
+
+    def reset(self) -> None:
+        self._record_success()
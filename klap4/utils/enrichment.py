@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+from typing import Any, Callable
+
+from klap4.config import config
+
+
+# Bounded so a slow upstream can only ever tie up this many threads, the rest of the lookups wait in its queue.
+enrichment_pool = ThreadPoolExecutor(max_workers=config.config()["enrichmentWorkers"],
+                                     thread_name_prefix="klap4-enrichment")
+
+
+def _run_enrichment(fn: Callable, *args, **kwargs) -> Any:
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        # Pool threads outlive the lookup, so don't leave a scoped session behind on them.
+        import klap4.db
+        if klap4.db.is_connected():
+            klap4.db.Session.remove()
+
+
+class Enrichment:
+    """An external lookup (i.e. Spotify artwork) running on the shared pool while the caller does its own work.
+
+    The deadline starts counting when the lookup is submitted. A lookup that misses it keeps running in the
+    background, so whatever cache it fills is there for the next display.
+
+    Example:
+        ``cover = Enrichment(get_album_cover, album.name, artist.name)``, then later ``cover.result()``.
+    """
+
+    def __init__(self, fn: Callable, *args, timeout: float = None, default: Any = None, **kwargs):
+        if timeout is None:
+            timeout = config.config()["enrichmentTimeout"]
+
+        self.default = default
+        self.deadline = time.monotonic() + timeout
+        self.future = enrichment_pool.submit(_run_enrichment, fn, *args, **kwargs)
+
+    def result(self) -> Any:
+        """Waits for the lookup until the deadline, returning the default if it timed out or failed."""
+        try:
+            return self.future.result(timeout=max(0.0, self.deadline - time.monotonic()))
+        except Exception:
+            return self.default
@@ -0,0 +1,71 @@
+import random
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from klap4.config import config
+
+# urllib3 1.26 renamed Retry's method_whitelist to allowed_methods, older versions (like the locked 1.25) only take the
+# old name.
+_RETRY_METHODS_ARG = "allowed_methods" if hasattr(Retry, "DEFAULT_ALLOWED_METHODS") else "method_whitelist"
+
+
+class JitteredRetry(Retry):
+    """urllib3 retry policy with full jitter on its exponential backoff.
+
+    Without the jitter every worker that got the same 429/5xx retries at the same instant and trips it again. A
+    ``Retry-After`` header still takes precedence, but is capped at ``httpMaxRetryAfter`` so a rate limit can't park a
+    worker thread for minutes.
+    """
+
+    def get_backoff_time(self) -> float:
+        return random.uniform(0, super().get_backoff_time())
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, config.config()["httpMaxRetryAfter"])
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """Connection pooling adapter that applies the configured (connect, read) timeout to requests that don't set one."""
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout", None) is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def http_timeout() -> tuple:
+    return config.config()["httpConnectTimeout"], config.config()["httpReadTimeout"]
+
+
+def build_http_session() -> requests.Session:
+    """Builds a session with pooled keep-alive connections, default timeouts and the retry policy."""
+    retry = JitteredRetry(total=config.config()["httpRetries"],
+                          backoff_factor=config.config()["httpBackoffFactor"],
+                          status_forcelist=(429, 500, 502, 503, 504),
+                          respect_retry_after_header=True,
+                          raise_on_status=False,
+                          **{_RETRY_METHODS_ARG: frozenset(["GET", "POST"])})
+
+    # One connection per enrichment worker plus the prefetch worker and a request thread, any more would sit idle.
+    adapter = TimeoutHTTPAdapter(pool_connections=4,
+                                 pool_maxsize=config.config()["enrichmentWorkers"] + 2,
+                                 max_retries=retry,
+                                 timeout=http_timeout())
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared by every external integration so connections (and their TLS handshakes) are reused between lookups.
+http_session = build_http_session()
@@ -1,4 +1,7 @@
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from flask import Response, json as flask_json, request, stream_with_context
+import sqlalchemy
 
 json = Dict[str, str]
 
@@ -26,4 +29,71 @@ def format_object_list(sql_object_list: List[SQLBase]) -> List[json]:
         obj = get_json(item)
         formatted_list.append(obj)
     
-    return formatted_list
\ No newline at end of file
+    return formatted_list
+
+
+class ColumnSerializer:
+    """Turns rows of a column-only query straight into dicts, skipping ORM instances and the identity map entirely.
+
+    The columns to select (and the keys of the output) are fixed up front, so every row comes out the same shape
+    regardless of what happens to be loaded.
+
+    Args:
+        columns: The mapped columns to select, each one's attribute name becomes its key.
+        computed: Extra fields to add to each dict, computed from the dict of column values.
+    """
+
+    def __init__(self, columns: Iterable, computed: Dict[str, Callable[[json], object]] = None):
+        self.columns = tuple(columns)
+        self.keys = tuple(column.key for column in self.columns)
+        self.computed = tuple((computed or {}).items())
+
+    @classmethod
+    def for_entity(cls, entity_type: type, **computed: Callable[[json], object]) -> "ColumnSerializer":
+        """Builds a serializer over every column of an entity's table, matching what ``get_json`` returns for it."""
+        return cls([getattr(entity_type, column.key) for column in entity_type.__table__.columns], computed)
+
+    def query(self, session) -> sqlalchemy.orm.Query:
+        return session.query(*self.columns)
+
+    def __call__(self, row) -> json:
+        dict_data = dict(zip(self.keys, row))
+        for name, compute in self.computed:
+            dict_data[name] = compute(dict_data)
+        return dict_data
+
+    def format_rows(self, rows: Iterable) -> List[json]:
+        return [self(row) for row in rows]
+
+
+def stream_requested() -> bool:
+    """If the current request asked for a streamed response (``?stream=1``)."""
+    return request.args.get("stream", "0").lower() in ["1", "true", "yes"]
+
+
+def stream_json_list(items: Iterable[json], *, chunk_size: int = None) -> Iterator[str]:
+    """Encodes items as a JSON array a chunk of elements at a time, so the whole list never has to be in memory."""
+    from klap4.config import config
+    if chunk_size is None:
+        chunk_size = config.config()["streamChunkSize"]
+
+    yield "["
+
+    chunk = []
+    first = True
+    for item in items:
+        chunk.append(flask_json.dumps(item))
+        if len(chunk) >= chunk_size:
+            yield ("" if first else ",") + ",".join(chunk)
+            chunk = []
+            first = False
+
+    if len(chunk) > 0:
+        yield ("" if first else ",") + ",".join(chunk)
+
+    yield "]"
+
+
+def stream_json_response(items: Iterable[json]) -> Response:
+    """A response that streams a JSON array out of ``items`` while they are still being produced."""
+    return Response(stream_with_context(stream_json_list(items)), mimetype="application/json")
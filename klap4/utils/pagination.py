@@ -0,0 +1,99 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from json import dumps, loads, JSONDecodeError
+from typing import List, Sequence, Tuple, Union
+
+from flask import request
+from sqlalchemy.sql.expression import tuple_
+
+from klap4.config import config
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Packs the sort key of the last row of a page into an opaque cursor string."""
+    return urlsafe_b64encode(dumps(list(values), separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    """Unpacks a cursor made by ``encode_cursor``, raising ``ValueError`` if it is malformed."""
+    try:
+        values = loads(urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed page cursor '{cursor}'.") from e
+
+    # Anything but a flat list of scalars would only fail once it is bound into the query.
+    if not isinstance(values, list) or not all(value is None or isinstance(value, (str, int, float))
+                                               for value in values):
+        raise ValueError(f"Malformed page cursor '{cursor}'.")
+
+    return values
+
+
+def paginate(query, key_columns: Sequence, *, limit: int, cursor: Union[str, None] = None) -> Tuple[list, Union[str, None]]:
+    """Fetches one page of a query using keyset pagination.
+
+    Rather than an ``OFFSET`` (which has to walk every skipped row), the page starts right after the sort key stored
+    in the cursor, so a deep page costs the same as the first one as long as the key columns are indexed.
+
+    Args:
+        query: The query to page through, it must not be ordered already.
+        key_columns: The columns to order by, together they must be unique for every row.
+        limit: The maximum number of rows in the page.
+        cursor: The cursor returned with the previous page, or ``None`` for the first page.
+
+    Returns:
+        A ``(rows, next_cursor)`` tuple, ``next_cursor`` is ``None`` on the last page.
+    """
+    key_columns = list(key_columns)
+
+    if cursor is not None:
+        values = decode_cursor(cursor)
+        if len(values) != len(key_columns):
+            raise ValueError(f"Malformed page cursor '{cursor}'.")
+        query = query.filter(tuple_(*key_columns) > tuple_(*values))
+
+    rows = query.add_columns(*key_columns) \
+        .order_by(*key_columns) \
+        .limit(limit + 1) \
+        .all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-len(key_columns):])
+
+    return [row[:-len(key_columns)] for row in rows], next_cursor
+
+
+def page_requested() -> bool:
+    """If the current request asked for a page (``?limit=`` and/or ``?cursor=``) rather than every result."""
+    return "limit" in request.args or "cursor" in request.args
+
+
+def count_requested() -> bool:
+    """If the current request only asked for the total number of results (``?count=1``)."""
+    return request.args.get("count", "0").lower() in ["1", "true", "yes"]
+
+
+def page_args() -> Tuple[int, Union[str, None]]:
+    """Reads the page limit and cursor from the current request, the limit is clamped to the configured maximum.
+
+    Raises:
+        ValueError: If the limit is not a positive number.
+    """
+    limit = int(request.args.get("limit", config.config()["pageLimit"]))
+    if limit < 1:
+        raise ValueError(f"Page limit must be positive, not {limit}.")
+
+    return min(limit, config.config()["maxPageLimit"]), request.args.get("cursor", None)
+
+
+def bad_page_request() -> Tuple[dict, int]:
+    """The response to a malformed limit or cursor, the same for every endpoint that pages."""
+    return {"error": 'Bad Request'}, 400
+
+
+def page_json(items: List, next_cursor: Union[str, None]) -> dict:
+    return {
+        "items": items,
+        "next_cursor": next_cursor
+    }
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
-from base64 import b64encode
 from json import dumps, loads
+from typing import Iterable, List, Tuple, Union
 
 import requests
 
 from klap4.utils.json_utils import json
+from klap4.config import config
+from klap4.utils.cache import LRUCache
+from klap4.utils.http_transport import http_session
+from klap4.utils.spotify_utils import spotify_breaker, spotify_token_manager
 
 
 class REFERENCE_TYPE:
@@ -14,67 +18,159 @@ class REFERENCE_TYPE:
     SPOTIFY = 2
 
 
-spotify_session = requests.Session()
+spotify_session = http_session
+
+# Last known metadata for each track.
+spotify_track_cache = LRUCache(config.config()["spotifyTrackCacheSize"])
 
 
 def authorize_spotify():
-    """Spotify only authorizes tokens 3 minutes at a time, so we must refresh it all the time."""
-    global spotify_session
+    """Forces a fresh token, the shared token manager otherwise refreshes it before it expires."""
+    spotify_token_manager.invalidate()
+    spotify_token_manager.get_access_token()
 
-    SPOTIFY_ID = "c0c7c51ed9fe407696fd32dfe3e0d89c"
-    SPOTIFY_SECRET = "3596e7c3022544e9865d6020e724b92d"
 
-    auth_token = b64encode(f"{SPOTIFY_ID}:{SPOTIFY_SECRET}".encode()).decode()
+def get_manual_metadata(metadata: str) -> json:
+    return loads(metadata)
 
-    r = requests.post(url="https://accounts.spotify.com/api/token",
-                      data={"grant_type": "client_credentials"},
-                      headers={"Authorization": f"Basic {auth_token}"})
-    if r.status_code != 200:
-        raise RuntimeError(f"Unable to authorize spotify (code: {r.status_code}): {r.json()}")
 
-    spotify_session.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+def _klap4_metadata(entity) -> json:
+    """The metadata of a song, or of an album for references that only point at the album a song is on."""
+    from klap4.db_entities.song import Song
 
+    if isinstance(entity, Song):
+        album, song_name = entity.album, entity.name
+    else:
+        album, song_name = entity, None
 
-def get_manual_metadata(metadata: str) -> json:
-    return loads(metadata)
+    return {
+        "artist": album.artist.name,
+        "album": album.name,
+        "song": song_name
+    }
 
 
 def get_klap4_metadata(song_key: str) -> json:
     from klap4.db_entities import get_entity_from_tag
 
-    song = get_entity_from_tag(song_key)
+    return _klap4_metadata(get_entity_from_tag(song_key))
 
-    return {
-        "artist": song.artist.name,
-        "album": song.album.name,
-        "song": song.name
-    }
 
+def get_klap4_metadata_batch(song_keys: Iterable[str]) -> List[Union[json, None]]:
+    """Looks up many library references with a fixed number of queries rather than one per reference.
+
+    Returns:
+        The metadata for each reference in the same order as given, ``None`` for ones that are no longer in the
+        library.
+    """
+    from klap4.db_entities import get_entities_from_tags
+
+    return [None if resolved.error is not None else _klap4_metadata(resolved.entity)
+            for resolved in get_entities_from_tags(song_keys)]
 
-def get_spotify_metadata(metadata_id: str) -> json:
-    r = spotify_session.get(f"https://api.spotify.com/v1/tracks/{metadata_id}")
 
-    # Spotify only authorizes tokens 3 minutes at a time so we have to retry from time to time.
+def _get_spotify_track(metadata_id: str) -> requests.Response:
+    r = spotify_session.get(f"{config.config()['spotifyApiUrl']}tracks/{metadata_id}",
+                            headers=spotify_token_manager.auth_header())
+
+    # Only happens if Spotify revoked the token early.
     if r.status_code == 401:
         authorize_spotify()
-        r = spotify_session.get(f"https://api.spotify.com/v1/tracks/{metadata_id}")
+        r = spotify_session.get(f"{config.config()['spotifyApiUrl']}tracks/{metadata_id}",
+                                headers=spotify_token_manager.auth_header())
+
+    # Server side errors count against the circuit, a bad track id doesn't.
+    if r.status_code == 429 or r.status_code >= 500:
+        raise RuntimeError(f"Error to contacting spotify (status code = {r.status_code}).")
+
+    return r
+
+
+def get_spotify_metadata(metadata_id: str) -> json:
+    # Track metadata doesn't change, so the last known copy is good both as a cache and for when Spotify is down.
+    cached = spotify_track_cache.get(metadata_id)
+    if cached is not None:
+        return cached
+
+    r = spotify_breaker.call(_get_spotify_track, metadata_id)
 
     if r.status_code != 200:
         raise RuntimeError(f"Error to contacting spotify (status code = {r.status_code}): {r.json()}")
 
-    song_data = r.json()
+    return_data = _parse_spotify_track(r.json())
+
+    spotify_track_cache.put(metadata_id, return_data)
+    return return_data
+
+
+def _get_spotify_tracks(metadata_ids: List[str]) -> requests.Response:
+    url = f"{config.config()['spotifyApiUrl']}tracks"
+    params = {"ids": ','.join(metadata_ids)}
+
+    r = spotify_session.get(url, params=params, headers=spotify_token_manager.auth_header())
 
+    # Only happens if Spotify revoked the token early.
+    if r.status_code == 401:
+        authorize_spotify()
+        r = spotify_session.get(url, params=params, headers=spotify_token_manager.auth_header())
+
+    if r.status_code != 200:
+        raise RuntimeError(f"Error to contacting spotify (status code = {r.status_code}).")
+
+    return r
+
+
+def get_spotify_metadata_batch(metadata_ids: Iterable[str]) -> List[Union[json, None]]:
+    """Looks up many Spotify tracks at once through the multi id tracks endpoint.
+
+    Tracks already in the cache are not requested again and the rest are fetched ``spotifyTrackBatchSize`` ids per
+    request, so a 60 track playlist costs two requests rather than sixty.
+
+    Returns:
+        The metadata for each id in the same order as given, ``None`` for tracks Spotify doesn't know about or that
+        couldn't be fetched (and weren't cached either).
+    """
+    metadata_ids = list(metadata_ids)
+    found = {}
+
+    missing = []
+    for metadata_id in dict.fromkeys(metadata_ids):
+        cached = spotify_track_cache.get(metadata_id)
+        if cached is None:
+            missing.append(metadata_id)
+        else:
+            found[metadata_id] = cached
+
+    batch_size = config.config()["spotifyTrackBatchSize"]
+    for i in range(0, len(missing), batch_size):
+        chunk = missing[i:i + batch_size]
+        try:
+            tracks = spotify_breaker.call(_get_spotify_tracks, chunk).json()["tracks"]
+        except (RuntimeError, requests.RequestException, KeyError):  # Includes CircuitOpenError.
+            continue
+
+        for metadata_id, song_data in zip(chunk, tracks):
+            if song_data is None:
+                continue
+            try:
+                found[metadata_id] = _parse_spotify_track(song_data)
+            except RuntimeError:  # Malformed, leave just this track unresolved.
+                continue
+            spotify_track_cache.put(metadata_id, found[metadata_id])
+
+    return [found.get(metadata_id, None) for metadata_id in metadata_ids]
+
+
+def _parse_spotify_track(song_data: dict) -> json:
     try:
-        return_data = {
+        return {
             "artist": song_data["artists"][0]["name"],
             "album": song_data["album"]["name"],
             "song": song_data["name"]
         }
-    except KeyError as e:
+    except (KeyError, IndexError, TypeError) as e:
         raise RuntimeError("Error processing spotify track metadata.") from e
 
-    return return_data
-
 
 normalize_metadata = {
     REFERENCE_TYPE.MANUAL: lambda metadata : dumps({key.lower(): value for key, value in loads(metadata).items()}),
@@ -90,3 +186,31 @@ get_metadata = {
 }
 
 
+# Reference types that are looked up many at a time by ``get_metadata_batch``.
+get_metadata_batches = {
+    REFERENCE_TYPE.IN_KLAP4: get_klap4_metadata_batch,
+    REFERENCE_TYPE.SPOTIFY: get_spotify_metadata_batch,
+}
+
+
+def get_metadata_batch(references: Iterable[Tuple[int, str]]) -> List[Union[json, None]]:
+    """Like ``get_metadata`` for many ``(reference_type, reference)`` pairs, returned in the same order as given.
+
+    Library references are all resolved together and Spotify tracks are looked up in batches, so the cost doesn't grow
+    with every entry. References that can't be resolved come back as ``None``.
+    """
+    references = list(references)
+
+    batched = {}
+    for reference_type, get_batch in get_metadata_batches.items():
+        batch = [reference for type_, reference in references if type_ == reference_type]
+        batched[reference_type] = iter(get_batch(batch) if len(batch) > 0 else [])
+
+    metadata = []
+    for reference_type, reference in references:
+        if reference_type in batched:
+            metadata.append(next(batched[reference_type]))
+        else:
+            metadata.append(get_metadata[reference_type](reference))
+
+    return metadata
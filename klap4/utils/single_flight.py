@@ -0,0 +1,69 @@
+from functools import wraps
+from threading import Event, Lock
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls so that only the first one actually runs.
+
+    Callers that ask for a key while it is already in flight wait for that call and share its result (or exception),
+    instead of each running the same expensive computation. Nothing is kept once the call finishes, so this is not a
+    cache: a call that starts after the previous one returned runs again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = Lock()
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key, None)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def single_flight(fn: Callable) -> Callable:
+    """Decorator that coalesces concurrent calls to ``fn`` made with the same (hashable) arguments.
+
+    The shared result is handed to every waiting caller as is, so only use it on functions whose results aren't
+    mutated afterwards and aren't bound to the calling thread (i.e. no ORM instances).
+    """
+    flight = SingleFlight()
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (args, frozenset(kwargs.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return fn(*args, **kwargs)  # Unhashable arguments (i.e. a list) can't be coalesced.
+        return flight.do(key, fn, *args, **kwargs)
+
+    wrapper.flight = flight
+    return wrapper
@@ -1,85 +1,109 @@
+from base64 import b64encode
+from threading import Lock
+import time
+
 import spotipy
-import sys
-import spotipy.oauth2 as oauth2
 
-# Function for getting artist image URL
-def getArtistImage(artist_name):
-    from klap4.config import config
+from klap4.config import config
+from klap4.utils.circuit_breaker import CircuitBreaker
+from klap4.utils.http_transport import http_session, http_timeout
 
-    CLIENT_ID = config.config()['spotifyClient']
-    CLIENT_SECRET = config.config()['spotifySecret']
 
-    try:
+class SpotifyUnavailableError(RuntimeError):
+    """Spotify could not be reached (or the circuit to it is open), as opposed to it not finding anything."""
 
-        credentials = oauth2.SpotifyClientCredentials(client_id=CLIENT_ID, client_secret=CLIENT_SECRET)
-        token = credentials.get_access_token(as_dict=False)
-
-        if token:
-            sp = spotipy.Spotify(auth=token)
-            if len(sys.argv) > 1:
-                name = ' '.join(sys.argv[1:])
-            else:
-                name = artist_name
-
-            results = sp.search(q='artist:' + name, type='artist')
-            items = results['artists']['items']
-            if len(items) > 0:
-                artist = items[0]
-                print(artist['name'], artist['images'][0]['url'])
-                return artist['images'][0]['url']
-            else:
-                return None
-    except:
-        return None
-
-# Function for getting related artists (for a given artist)
-def getRelatedArtists(artist_name):
-    from klap4.config import config
-
-    CLIENT_ID = config.config()['spotifyClient']
-    CLIENT_SECRET = config.config()['spotifySecret']
 
-    try:
+class SpotifyTokenManager:
+    """Process wide cache of the client credentials token, shared by every Spotify call.
 
-        credentials = oauth2.SpotifyClientCredentials(client_id=CLIENT_ID, client_secret=CLIENT_SECRET)
-        token = credentials.get_access_token(as_dict=False)
+    The token is fetched once and refreshed ``refresh_margin`` seconds before it expires, so requests never pay for a
+    token round trip or an expired token. It also fills in for spotipy's ``auth_manager``.
+    """
 
-        if token:
-            sp = spotipy.Spotify(auth=token)
-            results = sp.search(q='artist:' + artist_name, type="artist")
-            items = results['artists']['items']
-            
-            if len(items) > 0:
-                artist = items[0]
-                id = artist['id']
-                artists = sp.artist_related_artists(id)
-                return artists
-    except:    
-        return None
+    def __init__(self, *, refresh_margin: int = 60):
+        self.refresh_margin = refresh_margin
+        self._lock = Lock()
+        self._token = None
+        self._expires_at = 0
 
+    def _request_token(self) -> dict:
+        auth = b64encode(f"{config.config()['spotifyClient']}:{config.config()['spotifySecret']}".encode()).decode()
 
-# Function for getting album image
-def getAlbumCover(album_name, artist_name):
-    from klap4.config import config
+        r = http_session.post(url=config.config()["spotifyTokenUrl"],
+                              data={"grant_type": "client_credentials"},
+                              headers={"Authorization": f"Basic {auth}"})
+        if r.status_code != 200:
+            raise RuntimeError(f"Unable to authorize spotify (code: {r.status_code}): {r.text}")
+
+        return r.json()
+
+    def get_access_token(self, as_dict: bool = False):
+        """Returns the cached token, only one thread refreshes it when it is about to expire."""
+        with self._lock:
+            if self._token is None or time.time() >= self._expires_at - self.refresh_margin:
+                token_info = self._request_token()
+                self._token = token_info["access_token"]
+                self._expires_at = time.time() + token_info.get("expires_in", 3600)
+
+            if as_dict:
+                return {"access_token": self._token, "token_type": "Bearer", "expires_at": int(self._expires_at)}
+            return self._token
+
+    def auth_header(self) -> dict:
+        return {"Authorization": f"Bearer {self.get_access_token()}"}
+
+    def invalidate(self) -> None:
+        """Drops the cached token, for when Spotify revokes it early."""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0
 
-    CLIENT_ID = config.config()['spotifyClient']
-    CLIENT_SECRET = config.config()['spotifySecret']
 
+spotify_token_manager = SpotifyTokenManager()
+spotify = spotipy.Spotify(auth_manager=spotify_token_manager,
+                          requests_session=http_session,
+                          requests_timeout=http_timeout())
+spotify.prefix = config.config()["spotifyApiUrl"]
+
+# Shared by every call out to Spotify, so an outage fails fast everywhere instead of once per call site.
+spotify_breaker = CircuitBreaker("spotify",
+                                 failure_threshold=config.config()["spotifyFailureThreshold"],
+                                 reset_timeout=config.config()["spotifyResetTimeout"])
+
+
+def _search(q, type):
+    return spotify_breaker.call(spotify.search, q=q, type=type)
+
+
+# Function for getting an artist's image and related artists off of a single search, raises SpotifyUnavailableError
+# rather than returning None when Spotify can't be reached so that callers don't mistake an outage for a miss
+def getArtistMetadata(artist_name):
     try:
+        results = _search('artist:' + artist_name, 'artist')
+        items = results['artists']['items']
 
-        credentials = oauth2.SpotifyClientCredentials(client_id=CLIENT_ID, client_secret=CLIENT_SECRET)
-        token = credentials.get_access_token(as_dict=False)
-
-        if token:
-            sp = spotipy.Spotify(auth=token)
-
-            query = 'album:{0} artist:{1}'.format(album_name, artist_name)
-            results = sp.search(q=query, type='album')
-            items = results['albums']['items']
-            
-            if len(items) > 0:
-                album = items[0]
-                img = album['images'][0]['url']
-                return img
-    except:
-        return None
\ No newline at end of file
+        if len(items) > 0:
+            artist = items[0]
+            image = artist['images'][0]['url'] if len(artist['images']) > 0 else None
+            return image, spotify_breaker.call(spotify.artist_related_artists, artist['id'])
+        else:
+            return None, None
+    except Exception as e:
+        raise SpotifyUnavailableError(f"Unable to look up artist '{artist_name}' on spotify.") from e
+
+
+# Function for getting album image, raises SpotifyUnavailableError like getArtistMetadata
+def getAlbumCover(album_name, artist_name):
+    try:
+        query = 'album:{0} artist:{1}'.format(album_name, artist_name)
+        results = _search(query, 'album')
+        items = results['albums']['items']
+        
+        if len(items) > 0 and len(items[0]['images']) > 0:
+            album = items[0]
+            img = album['images'][0]['url']
+            return img
+        else:
+            return None
+    except Exception as e:
+        raise SpotifyUnavailableError(f"Unable to look up album '{album_name}' on spotify.") from e
\ No newline at end of file
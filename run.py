@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 
 from klap4 import api, db
+from klap4.services.prefetch_services import artwork_prefetcher
 
 
 def main():
@@ -11,7 +13,17 @@ def main():
         is_production = True
 
     db.connect("test.db", db_log_level="debug" if not is_production else "warning")
-    api.app.run(debug=not is_production)  # TODO if in production use a professional webserver like Waitress.
+
+    # Warms the Spotify cache for new albums in the background so their first view is as fast as the rest. With the
+    # reloader on (not in production) this process only watches for changes and the app is served from a child process,
+    # so it is only started in the child.
+    if is_production or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        artwork_prefetcher.start()
+
+    try:
+        api.app.run(debug=not is_production)  # TODO if in production use a professional webserver like Waitress.
+    finally:
+        artwork_prefetcher.stop()
 
 
 if __name__ == '__main__':
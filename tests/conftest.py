@@ -0,0 +1,99 @@
+import os
+from pathlib import Path
+import sys
+from threading import Thread
+
+import pytest
+import sqlalchemy
+import sqlalchemy.orm
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, str(Path(__file__).absolute().parent.parent/"Examples"))
+from spotify_emulator import SpotifyEmulator
+
+# Spotify is stood in for by the emulator, the URLs have to be set before klap4 builds its Spotify client.
+emulator = SpotifyEmulator(("127.0.0.1", 0))
+Thread(target=emulator.serve_forever, daemon=True).start()
+os.environ["KLAP4_SPOTIFY_API_URL"] = f"{emulator.url}/v1/"
+os.environ["KLAP4_SPOTIFY_TOKEN_URL"] = f"{emulator.url}/api/token"
+os.environ["KLAP4_SPOTIFY_CLIENT"] = "test-client"
+os.environ["KLAP4_SPOTIFY_SECRET"] = "test-secret"
+# Keeps the app from connecting to the repo's test.db when it is imported, each test gets its own database anyway.
+os.environ["KLAP4_DB_FILE"] = ":memory:"
+
+import klap4.db
+from klap4.api import app
+from klap4.db_entities import SQLBase, ref_cache, _decompose_tag
+from klap4.db_entities.genre import Genre
+from klap4.db_entities.artist import Artist
+from klap4.db_entities.album import Album
+from klap4.db_entities.song import Song
+from klap4.services.charts_services import chart_snapshots
+from klap4.utils.reference_metadata import spotify_track_cache
+from klap4.utils.spotify_utils import spotify_breaker
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Process wide caches would otherwise carry over from one test to the next."""
+    ref_cache.clear()
+    _decompose_tag.cache_clear()
+    chart_snapshots.invalidate()
+    spotify_track_cache.clear()
+    spotify_breaker.reset()
+
+
+@pytest.fixture
+def spotify_emulator():
+    """The running emulator, its fault injection is turned back off after the test."""
+    yield emulator
+    emulator.latency = emulator.jitter = emulator.error_rate = emulator.rate_limit = 0.0
+    emulator.token_lifetime = 3600
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Connects klap4 to a fresh in-memory database, every thread shares its one connection."""
+    engine = sqlalchemy.create_engine("sqlite://", connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    SQLBase.metadata.create_all(engine)
+
+    Session = sqlalchemy.orm.scoped_session(sqlalchemy.orm.sessionmaker(bind=engine))
+    monkeypatch.setattr(klap4.db, "Session", Session)
+
+    yield Session
+
+    Session.remove()
+    engine.dispose()
+
+
+@pytest.fixture
+def client(db):
+    """A test client for the app, backed by the test's database."""
+    return app.test_client()
+
+
+def add_album(session, genre_abbr: str = "RK", artist_num: int = 1, album_letter: str = "A", *, songs: int = 0,
+              **album_fields) -> Album:
+    """Adds an album (and its genre and artist if they don't exist yet) with ``songs`` songs, then flushes."""
+    genre = session.query(Genre).filter(Genre.abbreviation == genre_abbr).one_or_none()
+    if genre is None:
+        genre = Genre(abbreviation=genre_abbr, name=f"Genre {genre_abbr}", color="#000000")
+        session.add(genre)
+        session.flush()
+
+    artist = session.query(Artist).filter(Artist.genre_id == genre.id, Artist.number == artist_num).one_or_none()
+    if artist is None:
+        artist = Artist(genre_id=genre.id, number=artist_num, name=f"Artist {genre_abbr}{artist_num}")
+        session.add(artist)
+        session.flush()
+
+    album_fields = {"name": f"Album {genre_abbr}{artist_num}{album_letter}", "format_bitfield": Album.FORMAT.CD,
+                    **album_fields}
+    album = Album(artist_id=artist.id, letter=album_letter, **album_fields)
+    session.add(album)
+    session.flush()
+
+    session.add_all(Song(album_id=album.id, number=number, name=f"Song {number}") for number in range(1, songs + 1))
+    session.flush()
+
+    return album
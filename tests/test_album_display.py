@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from threading import get_ident
+
+import pytest
+from sqlalchemy import event
+
+import klap4.db
+from klap4.db_entities.label_and_promoter import Label, Promoter
+from klap4.resources.album import AlbumAPI
+
+from conftest import add_album
+
+
+@contextmanager
+def count_queries():
+    """Counts the statements this thread executes, the cover art lookup runs on the enrichment pool."""
+    engine = klap4.db.Session().get_bind()
+    thread = get_ident()
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if get_ident() == thread:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.parametrize("songs", [0, 11, 30])
+def test_album_display_query_count(db, songs):
+    session = db()
+    add_album(session, songs=songs, label=Label(name="Label", url="https://example.com"),
+              promoter=Promoter(name="Promoter"))
+    session.commit()
+    session.expire_all()
+
+    with count_queries() as statements:
+        album = AlbumAPI().get("RK1A")
+
+    assert len(album["songs"]) == songs
+    assert (album["label"], album["promoter"]) == ("Label", "Promoter")
+    assert album["image"] is not None
+    # The tag lookup (joining in the artist, genre, label and promoter), then the reviews, problems and songs.
+    assert len(statements) == 4, "\n\n".join(statements)
@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import random
+from threading import Event
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from klap4.db_entities.play_history import record_play
+from klap4.db_entities.song import Song
+from klap4.services import charts_services
+from klap4.services.charts_services import charts_format, chart_snapshots, generate_chart, generate_charts, \
+    get_chart, get_charts, CHART_WINDOWS
+
+from conftest import add_album
+
+
+@pytest.fixture
+def played_catalog(db):
+    """A few dozen albums, some of them new, with 3000 plays spread over the last two and a half years."""
+    session = db()
+    rng = random.Random(4096)
+
+    for genre_abbr in ("RK", "EM", "HH"):
+        for artist_num in range(1, 5):
+            for album_letter in "ABC":
+                date_added = datetime.now() - timedelta(days=rng.choice([10, 60, 400, 2000]))
+                add_album(session, genre_abbr, artist_num, album_letter, songs=2, date_added=date_added)
+
+    songs = session.query(Song).all()
+    for _ in range(3000):
+        record_play(session, rng.choice(songs), datetime.now() - timedelta(days=rng.uniform(0, 900)))
+    session.commit()
+
+
+def test_generate_charts_matches_generate_chart(db, played_catalog):
+    for form in ("all", "new"):
+        charts = generate_charts(form, CHART_WINDOWS)
+
+        assert sorted(charts) == list(CHART_WINDOWS)
+        for weeks in CHART_WINDOWS:
+            assert len(charts[weeks]) > 0
+            assert charts[weeks] == generate_chart(form, weeks), f"{form} {weeks} week chart"
+
+
+def test_generate_charts_unknown_format(db):
+    assert generate_charts("bogus", (1, 4)) == {1: [], 4: []}
+
+
+def test_generate_charts_without_plays(db):
+    add_album(db(), songs=1)
+    assert generate_charts("all", (1, 4)) == {1: [], 4: []}
+
+
+def test_play_logged_mid_query_is_not_cached(db, monkeypatch):
+    session = db()
+    album = add_album(session, songs=1)
+    record_play(session, album.songs[0])
+    session.commit()
+
+    # Hold the first chart query after it has read the plays, as if it were slow.
+    read, release = Event(), Event()
+    chart_query = charts_services._chart_query
+
+    def slow_chart_query(*args):
+        rows = chart_query(*args).all()
+        read.set()
+        release.wait(5)
+        return SimpleNamespace(all=lambda: rows)
+
+    monkeypatch.setattr(charts_services, "_chart_query", slow_chart_query)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(get_chart, "all", 4)
+        assert read.wait(5)
+
+        for _ in range(50):
+            record_play(session, album.songs[0])
+        session.commit()
+
+        # Arrives after the plays were committed, but joins the build that started before them.
+        second = pool.submit(get_chart, "all", 4)
+        time.sleep(0.2)
+        release.set()
+
+        assert first.result()[0]["times_played"] == 1
+        assert second.result()[0]["times_played"] == 1
+
+    assert chart_snapshots.get("all", 4) is None
+    assert get_chart("all", 4)[0]["times_played"] == 51
+    assert get_chart("all", 4) is chart_snapshots.get("all", 4)
+
+
+def test_deleted_album_is_skipped(db, monkeypatch):
+    session = db()
+    for album_letter in "ABC":
+        add_album(session, album_letter=album_letter)
+    session.commit()
+
+    # RK1D was deleted between ranking the chart and formatting it.
+    chart = [("RK", 1, "B", 9), ("RK", 1, "D", 7), ("RK", 1, "A", 5)]
+    assert [(album["rank"], album["album_id"]) for album in charts_format(chart)] == [(1, "RK1B"), (2, "RK1A")]
+
+    monkeypatch.setattr(charts_services, "generate_charts", lambda form, windows: {1: chart[1:], 4: chart})
+    charts = get_charts("all", (1, 4))
+    assert [(album["rank"], album["album_id"]) for album in charts[1]] == [(1, "RK1A")]
+    assert [(album["rank"], album["album_id"]) for album in charts[4]] == [(1, "RK1B"), (2, "RK1A")]
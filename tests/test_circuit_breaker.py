@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+import time
+
+import pytest
+
+from klap4.db_entities.spotify_cache import SpotifyCache, get_album_cover
+from klap4.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from klap4.utils.spotify_utils import getAlbumCover, spotify_breaker, SpotifyUnavailableError
+
+
+def fail():
+    raise ConnectionError("upstream is down")
+
+
+def trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+
+    breaker.call(lambda: None)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    breaker.call(lambda: None)  # A success resets the count.
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    trip(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(calls.append, 1)
+    assert calls == []
+
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    trip(breaker)
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == CircuitBreaker.OPEN  # One failed probe is enough.
+
+    time.sleep(0.06)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_open_circuit_serves_stale_cache_without_calling_spotify(db, spotify_emulator, monkeypatch):
+    session = db()
+    session.add(SpotifyCache(artist_key="the strokes", album_key="is this it", image_url="stale", found=True,
+                             fetched_at=datetime.now() - timedelta(days=365)))
+    session.commit()
+
+    monkeypatch.setattr(spotify_breaker, "reset_timeout", 0.05)
+    trip(spotify_breaker)
+    searches = spotify_emulator.snapshot().get("search", 0)
+
+    with pytest.raises(SpotifyUnavailableError):
+        getAlbumCover("Is This It", "The Strokes")
+    assert get_album_cover("Is This It", "The Strokes") == "stale"
+    assert spotify_emulator.snapshot().get("search", 0) == searches
+
+    # Once the reset timeout passes the next lookup probes Spotify, which closes the circuit and refreshes the row.
+    time.sleep(0.06)
+    image_url = get_album_cover("Is This It", "The Strokes")
+    assert image_url.startswith("https://i.scdn.co/image/album-")
+    assert spotify_breaker.state == CircuitBreaker.CLOSED
+    assert spotify_emulator.snapshot()["search"] == searches + 1
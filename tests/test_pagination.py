@@ -0,0 +1,106 @@
+from base64 import urlsafe_b64encode
+
+import pytest
+
+from klap4.api import app
+from klap4.utils import pagination
+from klap4.utils.pagination import encode_cursor, decode_cursor, page_args
+
+from conftest import add_album
+
+EVERYTHING = {"genre": "", "artistName": "", "name": ""}
+
+
+def test_cursor_round_trip():
+    values = ["RK", 3, "B", None, 1.5]
+    assert decode_cursor(encode_cursor(values)) == values
+    assert decode_cursor(encode_cursor(("RK", 3))) == ["RK", 3]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    urlsafe_b64encode(b"not json").decode(),
+    urlsafe_b64encode(b"\xff\xfe").decode(),
+    urlsafe_b64encode(b'{"genre": "RK"}').decode(),
+    urlsafe_b64encode(b'"RK"').decode(),
+    urlsafe_b64encode(b'[["RK"], 1]').decode(),
+    urlsafe_b64encode(b'["RK", {"number": 1}]').decode(),
+])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_limit_is_clamped_to_maximum():
+    with app.test_request_context("/?limit=100000"):
+        assert page_args() == (500, None)
+    with app.test_request_context("/?limit=7&cursor=abc"):
+        assert page_args() == (7, "abc")
+
+    for limit in ("0", "-1", "ten"):
+        with app.test_request_context(f"/?limit={limit}"), pytest.raises(ValueError):
+            page_args()
+
+
+@pytest.fixture
+def catalog(db):
+    session = db()
+    for genre_abbr in ("RK", "EM"):
+        for artist_num in range(1, 4):
+            for album_letter in "AB":
+                add_album(session, genre_abbr, artist_num, album_letter)
+    session.commit()
+
+
+def walk(client, limit: int) -> list:
+    pages = []
+    url = f"/search/album?limit={limit}"
+    while True:
+        page = client.post(url, json=EVERYTHING).get_json()
+        pages.append([album["id"] for album in page["items"]])
+        if page["next_cursor"] is None:
+            return pages
+        url = f"/search/album?limit={limit}&cursor={page['next_cursor']}"
+
+
+def test_walk_pages(client, catalog):
+    pages = walk(client, 5)
+
+    assert [len(page) for page in pages] == [5, 5, 2]
+    assert sum(pages, []) == ["EM1A", "EM1B", "EM2A", "EM2B", "EM3A", "EM3B",
+                              "RK1A", "RK1B", "RK2A", "RK2B", "RK3A", "RK3B"]
+    assert walk(client, 12) == [sum(pages, [])]
+    assert sorted(sum(pages, [])) == sorted(album["id"] for album in client.post("/search/album", json=EVERYTHING)
+                                            .get_json())
+
+
+def test_limit_above_maximum(client, catalog, monkeypatch):
+    config = pagination.config.config()
+    monkeypatch.setattr(pagination.config, "config", lambda: {**config, "maxPageLimit": 4})
+
+    assert [len(page) for page in walk(client, 100)] == [4, 4, 4]
+
+
+@pytest.mark.parametrize("query", [
+    "limit=0",
+    "limit=ten",
+    "cursor=not-a-cursor",
+    f"cursor={encode_cursor(['RK'])}",
+    f"cursor={encode_cursor(['RK', [1], 'A'])}",
+])
+def test_bad_page_request(client, catalog, query):
+    response = client.post(f"/search/album?{query}", json=EVERYTHING)
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Bad Request"}
+
+
+def test_tampered_cursor(client, catalog):
+    cursor = client.post("/search/album?limit=5", json=EVERYTHING).get_json()["next_cursor"]
+    tampered = cursor[:-4]
+
+    for response in (client.post(f"/search/album?limit=5&cursor={tampered}", json=EVERYTHING),
+                     client.post(f"/search/artist?cursor={tampered}", json={"genre": "", "name": ""}),
+                     client.get(f"/search/program?cursor={tampered}")):
+        assert response.status_code == 400
+        assert response.get_json() == {"error": "Bad Request"}
@@ -0,0 +1,116 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from klap4.db_entities.dj import DJ
+from klap4.db_entities.play_history import week_start, record_play, backfill_play_rollups, AlbumWeeklyPlays, \
+    PlayEvent
+from klap4.db_entities.playlist import Playlist, PlaylistEntry
+from klap4.db_entities.song import Song
+from klap4.services import playlist_services
+from klap4.services.playlist_services import add_playlist_entry
+from klap4.utils.reference_metadata import REFERENCE_TYPE
+
+from conftest import add_album
+
+# A Wednesday.
+WEDNESDAY = datetime(2020, 4, 8, 15, 30)
+MONDAY = date(2020, 4, 6)
+
+
+def rollups(session) -> dict:
+    return {(rollup.album_id, rollup.week_start): rollup.plays for rollup in session.query(AlbumWeeklyPlays)}
+
+
+def test_week_start():
+    assert week_start(WEDNESDAY) == MONDAY
+    assert week_start(WEDNESDAY.date()) == MONDAY
+    assert week_start(datetime(2020, 4, 6)) == MONDAY
+    assert week_start(datetime(2020, 4, 12, 23, 59)) == MONDAY
+
+
+def test_record_play_rolls_up_by_album_and_week(db):
+    session = db()
+    first = add_album(session, album_letter="A", songs=2)
+    second = add_album(session, album_letter="B", songs=1)
+    first_songs = sorted(first.songs, key=lambda song: song.number)
+
+    record_play(session, first_songs[0], WEDNESDAY)
+    record_play(session, first_songs[1], WEDNESDAY + timedelta(days=4))  # Sunday, the same week.
+    record_play(session, first_songs[0], WEDNESDAY + timedelta(days=5))  # The next Monday.
+    record_play(session, second.songs[0], WEDNESDAY)
+    session.commit()
+
+    assert session.query(PlayEvent).count() == 4
+    assert rollups(session) == {
+        (first.id, MONDAY): 2,
+        (first.id, MONDAY + timedelta(weeks=1)): 1,
+        (second.id, MONDAY): 1,
+    }
+
+
+def test_backfill_from_song_counters(db):
+    session = db()
+    first = add_album(session, album_letter="A", songs=3)
+    second = add_album(session, album_letter="B", songs=1)
+
+    first_songs = sorted(first.songs, key=lambda song: song.number)
+    for song, times_played, last_played in [(first_songs[0], 3, WEDNESDAY),
+                                            (first_songs[1], 2, WEDNESDAY + timedelta(days=1)),
+                                            (first_songs[2], 0, WEDNESDAY),
+                                            (second.songs[0], 5, WEDNESDAY - timedelta(weeks=2))]:
+        song.times_played = times_played
+        song.last_played = last_played
+
+    backfill_play_rollups(session)
+    session.commit()
+    assert rollups(session) == {
+        (first.id, MONDAY): 5,
+        (second.id, MONDAY - timedelta(weeks=2)): 5,
+    }
+
+    # Only ever seeds an empty history.
+    second.songs[0].times_played = 50
+    backfill_play_rollups(session)
+    session.commit()
+    assert rollups(session)[(second.id, MONDAY - timedelta(weeks=2))] == 5
+
+
+@pytest.fixture
+def playlist(db):
+    session = db()
+    add_album(session, songs=1)
+    session.add(DJ(id="dj1", name="DJ", is_admin=False))
+    session.add(Playlist(dj_id="dj1", name="Show", show="Show"))
+    session.commit()
+
+
+def library_entry(session) -> dict:
+    song = session.query(Song).one()
+    return {"song": song.name, "album": song.album.name, "artist": song.album.artist.name}
+
+
+def test_playlist_entry_records_a_play(db, playlist):
+    session = db()
+    add_playlist_entry("dj1", "Show", library_entry(session))
+    add_playlist_entry("dj1", "Show", {"song": "Unknown", "album": "Unknown", "artist": "Unknown"})
+
+    entries = session.query(PlaylistEntry).order_by(PlaylistEntry.index).all()
+    assert [entry.reference_type for entry in entries] == [REFERENCE_TYPE.IN_KLAP4, REFERENCE_TYPE.MANUAL]
+    assert session.query(Song).one().times_played == 1
+    assert list(rollups(session).values()) == [1]
+
+
+def test_playlist_entry_does_not_hide_a_failed_play(db, playlist, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("Rollup write failed.")
+
+    monkeypatch.setattr(playlist_services, "record_play", fail)
+
+    session = db()
+    with pytest.raises(RuntimeError):
+        add_playlist_entry("dj1", "Show", library_entry(session))
+
+    session.rollback()
+    assert session.query(PlaylistEntry).count() == 0
+    assert session.query(Song).one().times_played == 0
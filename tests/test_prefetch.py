@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from klap4.db_entities.spotify_cache import SpotifyCache
+from klap4.services import prefetch_services
+from klap4.services.prefetch_services import artwork_prefetcher
+from klap4.utils.spotify_utils import spotify_breaker
+
+from conftest import add_album
+
+
+def wait_for(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out waiting on the prefetcher."
+        time.sleep(0.01)
+
+
+def fail():
+    raise ConnectionError("upstream is down")
+
+
+def searches(spotify_emulator) -> int:
+    return spotify_emulator.snapshot().get("search", 0)
+
+
+@pytest.fixture
+def prefetcher(db, monkeypatch):
+    """The app's prefetcher throttled to 100 lookups a second rather than two, stopped after the test.
+
+    Each lookup it finishes is appended to its ``fetched`` list.
+    """
+    config = prefetch_services.config.config()
+    monkeypatch.setattr(prefetch_services.config, "config", lambda: {**config, "prefetchRate": 100.0})
+
+    fetched = []
+    fetch = artwork_prefetcher._fetch
+
+    def record_fetch(key):
+        fetch(key)
+        fetched.append(key)
+
+    monkeypatch.setattr(artwork_prefetcher, "_fetch", record_fetch)
+    monkeypatch.setattr(artwork_prefetcher, "fetched", fetched, raising=False)
+
+    session = db()
+    add_album(session)
+    session.commit()
+
+    yield artwork_prefetcher
+    artwork_prefetcher.stop()
+
+
+def cached_keys(session) -> set:
+    return {(entry.artist_key, entry.album_key, entry.found) for entry in session.query(SpotifyCache)}
+
+
+def test_prefetcher_fills_cache_and_stops(db, spotify_emulator, prefetcher):
+    before = searches(spotify_emulator)
+
+    # Starting sweeps in the new album listing, the album and its artist.
+    prefetcher.start()
+    assert prefetcher.is_running
+    wait_for(lambda: len(prefetcher.fetched) == 2)
+
+    # New stock is queued as it is inserted.
+    session = db()
+    add_album(session, artist_num=2)
+    session.commit()
+    wait_for(lambda: len(prefetcher.fetched) == 4)
+
+    prefetcher.stop()
+    assert not prefetcher.is_running
+    assert sorted(prefetcher.fetched) == [("album", "Album RK1A", "Artist RK1"), ("album", "Album RK2A", "Artist RK2"),
+                                          ("artist", "Artist RK1"), ("artist", "Artist RK2")]
+    assert searches(spotify_emulator) == before + 4
+    assert cached_keys(session) == {("artist rk1", "", True), ("artist rk1", "album rk1a", True),
+                                    ("artist rk2", "", True), ("artist rk2", "album rk2a", True)}
+
+    # Not running anymore, so inserts aren't queued.
+    add_album(session, artist_num=3)
+    session.commit()
+    assert prefetcher._queue.empty()
+    prefetcher.stop()  # Stopping twice is harmless.
+
+
+def test_open_circuit_leaves_cache_alone(db, spotify_emulator, prefetcher):
+    for _ in range(spotify_breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            spotify_breaker.call(fail)
+    before = searches(spotify_emulator)
+
+    prefetcher.start()
+    wait_for(lambda: len(prefetcher.fetched) == 2)
+    assert prefetcher.is_running
+    prefetcher.stop()
+
+    # Every lookup short circuits, nothing is cached so they are retried on the next sweep.
+    assert searches(spotify_emulator) == before
+    assert cached_keys(db()) == set()
@@ -0,0 +1,92 @@
+from json import dumps
+
+import klap4.db_entities
+from klap4.db_entities.dj import DJ
+from klap4.db_entities.playlist import Playlist, PlaylistEntry
+from klap4.services.playlist_services import add_playlist_entry
+from klap4.utils import reference_metadata
+from klap4.utils.reference_metadata import get_spotify_metadata_batch, REFERENCE_TYPE
+
+from conftest import add_album
+
+
+def test_batch_lookup(spotify_emulator):
+    ids = [f"track{i:02d}" for i in range(60)]
+    requests = spotify_emulator.snapshot().get("tracks", 0)
+
+    metadata = get_spotify_metadata_batch(ids + ids[:5])
+
+    assert [track["song"] for track in metadata] == [f"Track {track_id[:6]}" for track_id in ids + ids[:5]]
+    assert spotify_emulator.snapshot()["tracks"] == requests + 2  # 50 ids per request.
+
+    # Everything is cached now.
+    get_spotify_metadata_batch(ids)
+    assert spotify_emulator.snapshot()["tracks"] == requests + 2
+
+
+class FakeResponse:
+    def __init__(self, body: dict):
+        self.body = body
+
+    def json(self) -> dict:
+        return self.body
+
+
+def test_malformed_track_is_left_unresolved(monkeypatch):
+    good_track = {"name": "Last Nite", "album": {"name": "Is This It"}, "artists": [{"name": "The Strokes"}]}
+    monkeypatch.setattr(reference_metadata, "_get_spotify_tracks", lambda ids: FakeResponse({"tracks": [
+        good_track,
+        {"name": "No Album", "artists": [{"name": "Someone"}]},
+        {"name": "No Artists", "album": {"name": "Album"}, "artists": []},
+        None,
+    ]}))
+
+    assert get_spotify_metadata_batch(["good", "no-album", "no-artists", "unknown"]) == [
+        {"artist": "The Strokes", "album": "Is This It", "song": "Last Nite"},
+        None,
+        None,
+        None,
+    ]
+
+
+def test_playlist_song_data(db, spotify_emulator, monkeypatch):
+    session = db()
+    add_album(session, songs=2)
+    session.add(DJ(id="dj1", name="DJ", is_admin=False))
+    session.add(Playlist(dj_id="dj1", name="Show", show="Show"))
+    session.commit()
+    playlist = session.query(Playlist).one()
+
+    # Stored the way the playlist service does it, against the album the song is on.
+    add_playlist_entry("dj1", "Show", {"song": "Song 2", "album": "Album RK1A", "artist": "Artist RK1"})
+    for index, reference_type, reference in [(2, REFERENCE_TYPE.SPOTIFY, "trk001"),
+                                             (3, REFERENCE_TYPE.IN_KLAP4, "RK1A1"),
+                                             (4, REFERENCE_TYPE.IN_KLAP4, "RK9Z1"),
+                                             (5, REFERENCE_TYPE.MANUAL, dumps({"artist": "A", "album": "B", "song": "C"})),
+                                             (6, REFERENCE_TYPE.SPOTIFY, "trk002")]:
+        session.add(PlaylistEntry(playlist_id=playlist.id, index=index, reference_type=reference_type,
+                                  reference=reference, entry={}))
+    session.commit()
+    session.expire_all()
+
+    # Every library reference is resolved in one go rather than tag by tag.
+    def get_entity_from_tag(*args, **kwargs):
+        raise AssertionError("Resolved a library reference on its own.")
+
+    tracks = spotify_emulator.snapshot().get("tracks", 0)
+    with monkeypatch.context() as patch:
+        patch.setattr(klap4.db_entities, "get_entity_from_tag", get_entity_from_tag)
+        song_data = playlist.get_song_data()
+
+    assert song_data == [
+        {"artist": "Artist RK1", "album": "Album RK1A", "song": "Song 2"},
+        {"artist": "Artist trk", "album": "Album trk0", "song": "Track trk001"},
+        {"artist": "Artist RK1", "album": "Album RK1A", "song": "Song 1"},
+        None,
+        {"artist": "A", "album": "B", "song": "C"},
+        {"artist": "Artist trk", "album": "Album trk0", "song": "Track trk002"},
+    ]
+    assert spotify_emulator.snapshot()["tracks"] == tracks + 1
+
+    entries = sorted(playlist.playlist_entries, key=lambda entry: entry.index)
+    assert [entry.get_song_data() for entry in entries[:3]] == song_data[:3]
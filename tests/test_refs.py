@@ -0,0 +1,137 @@
+import pytest
+from sqlalchemy.orm.exc import NoResultFound
+
+from klap4.db_entities import get_entity_from_tag, get_entities_from_tags, ref_cache
+from klap4.db_entities.album import Album, AlbumReview
+from klap4.db_entities.artist import Artist
+from klap4.db_entities.dj import DJ
+from klap4.db_entities.genre import Genre
+from klap4.db_entities.playlist import Playlist, PlaylistEntry
+from klap4.db_entities.song import Song
+
+from conftest import add_album
+
+
+@pytest.fixture
+def album(db):
+    session = db()
+    album = add_album(session, songs=2)
+    session.add(DJ(id="dj1", name="DJ", is_admin=False))
+    review = AlbumReview(album_id=album.id, dj_id="dj1", content="Good.")
+    review.id = 1  # A tag when passed to the constructor.
+    session.add(review)
+    session.commit()
+    return album
+
+
+def refs(session) -> list:
+    album = session.query(AlbumReview).one().album
+    return [album.artist.ref, album.ref] + [song.ref for song in session.query(Song).order_by(Song.number)] + \
+           [review.ref for review in album.reviews]
+
+
+def test_refs_set_on_insert(db, album):
+    assert refs(db()) == ["RK1", "RK1A", "RK1A1", "RK1A2", "RK1A-R1"]
+
+
+def test_artist_renumber_cascades(db, album):
+    session = db()
+    album.artist.number = 7
+    session.commit()
+
+    session.expire_all()
+    assert refs(session) == ["RK7", "RK7A", "RK7A1", "RK7A2", "RK7A-R1"]
+
+
+def test_genre_rename_cascades(db, album):
+    session = db()
+    session.query(Genre).one().abbreviation = "RR"
+    session.commit()
+
+    session.expire_all()
+    assert refs(session) == ["RR1", "RR1A", "RR1A1", "RR1A2", "RR1A-R1"]
+
+
+def test_swapping_song_numbers(db, album):
+    session = db()
+    first, second = sorted(album.songs, key=lambda song: song.number)
+    first.number, second.number = 2, 1
+    session.commit()
+
+    session.expire_all()
+    assert refs(session) == ["RK1", "RK1A", "RK1A1", "RK1A2", "RK1A-R1"]
+    assert get_entity_from_tag("RK1A1").name == "Song 2"
+    assert get_entity_from_tag("RK1A2").name == "Song 1"
+
+
+def test_swapping_album_letters(db, album):
+    session = db()
+    other = add_album(session, album_letter="B", songs=1)
+    album.letter, other.letter = "B", "A"
+    session.commit()
+
+    session.expire_all()
+    assert get_entity_from_tag("RK1A1").album.name == "Album RK1B"
+    assert get_entity_from_tag("RK1B2").album.name == "Album RK1A"
+    assert get_entity_from_tag("RK1B-dj1").content == "Good."
+
+
+def test_renumber_invalidates_ref_cache(db, album):
+    session = db()
+    assert get_entity_from_tag("RK1A1").name == "Song 1"
+    assert len(ref_cache) == 1
+
+    album.letter = "C"
+    session.commit()
+    assert len(ref_cache) == 0
+
+    with pytest.raises(NoResultFound):
+        get_entity_from_tag("RK1A1")
+    assert get_entity_from_tag("RK1C1").name == "Song 1"
+
+
+def test_entities_from_tags_at_every_level(db, album):
+    session = db()
+    session.add(Playlist(dj_id="dj1", name="Show", show="Show"))
+    session.flush()
+    session.add(PlaylistEntry(playlist_id=session.query(Playlist).one().id, index=1, reference_type=0,
+                              reference="{}", entry={}))
+    session.commit()
+
+    tags = ["RK1A2", "RK", "dj1+Show+1", "RK1A", "RK1A-dj1", "RK1", "dj1+Show", "RK1A1"]
+    resolved = get_entities_from_tags(tags)
+
+    assert [tag for tag, _, _ in resolved] == tags
+    assert [error for _, _, error in resolved] == [None] * len(tags)
+    assert [(type(entity), entity.ref) for _, entity, _ in resolved] == [
+        (Song, "RK1A2"),
+        (Genre, "RK"),
+        (PlaylistEntry, "dj1+Show+1"),
+        (Album, "RK1A"),
+        (AlbumReview, "RK1A-R1"),
+        (Artist, "RK1"),
+        (Playlist, "dj1+Show"),
+        (Song, "RK1A1"),
+    ]
+
+
+def test_entities_from_tags_duplicate_and_missing(db, album):
+    resolved = get_entities_from_tags(["RK1A1", "RK1A9", "RK1A1", "RK2", "RK1A2"])
+
+    assert [entity.ref if entity is not None else None for _, entity, _ in resolved] == \
+        ["RK1A1", None, "RK1A1", None, "RK1A2"]
+    assert resolved[0].entity is resolved[2].entity
+    assert [error for _, _, error in resolved] == \
+        [None, "No tag found: 'RK1A9'", None, "No tag found: 'RK2'", None]
+
+
+def test_entities_from_tags_chunks_large_input(db):
+    session = db()
+    add_album(session, songs=1000)
+    session.commit()
+
+    tags = [f"RK1A{number}" for number in range(1000, 0, -1)]
+    resolved = get_entities_from_tags(tags)
+
+    assert [entity.ref for _, entity, _ in resolved] == tags
+    assert all(error is None for _, _, error in resolved)
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from klap4.db_entities.spotify_cache import SpotifyCache, _cached_spotify_row
+
+
+def test_concurrent_fill_keeps_the_first_row(db):
+    def fetch() -> dict:
+        # Someone else fills the same key while this lookup is waiting on Spotify.
+        other_session = db.session_factory()
+        other_session.add(SpotifyCache(artist_key="the cure", album_key="disintegration", image_url="first",
+                                       found=True, fetched_at=datetime.now()))
+        other_session.commit()
+        other_session.close()
+        return {"image_url": "second"}
+
+    assert _cached_spotify_row("The  Cure", "Disintegration", fetch) == ("first", None)
+    assert db().query(SpotifyCache).count() == 1
+
+
+def test_fresh_row_is_not_fetched_again(db):
+    assert _cached_spotify_row("The Cure", None, lambda: {"image_url": "image"}) == ("image", None)
+    assert _cached_spotify_row("the cure", None, lambda: {"image_url": "other"}) == ("image", None)
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from klap4.utils.spotify_utils import SpotifyTokenManager
+
+
+def token_requests(spotify_emulator) -> int:
+    return spotify_emulator.snapshot().get("token", 0)
+
+
+def test_token_refreshes_before_it_expires(spotify_emulator):
+    spotify_emulator.token_lifetime = 61
+    manager = SpotifyTokenManager(refresh_margin=60)
+    requests = token_requests(spotify_emulator)
+
+    token = manager.get_access_token()
+    assert manager.get_access_token() == token
+    assert token_requests(spotify_emulator) == requests + 1
+
+    # Within a minute of expiring, so the next call refreshes it even though it is still valid.
+    time.sleep(1.1)
+    refreshed = manager.get_access_token(as_dict=True)
+    assert refreshed["access_token"] != token
+    assert refreshed["expires_at"] > time.time() + 60
+    assert token_requests(spotify_emulator) == requests + 2
+
+
+def test_concurrent_callers_share_one_token(spotify_emulator):
+    manager = SpotifyTokenManager()
+    requests = token_requests(spotify_emulator)
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        tokens = set(pool.map(lambda _: manager.get_access_token(), range(20)))
+
+    assert len(tokens) == 1
+    assert token_requests(spotify_emulator) == requests + 1
+
+
+def test_invalidate_forces_a_new_token(spotify_emulator):
+    manager = SpotifyTokenManager()
+    token = manager.get_access_token()
+
+    manager.invalidate()
+    assert manager.auth_header() != {"Authorization": f"Bearer {token}"}
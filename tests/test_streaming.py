@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from klap4.utils.json_utils import stream_json_list
+
+from conftest import add_album
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 5])
+def test_stream_json_list_chunks(count):
+    items = [{"n": n} for n in range(count)]
+    chunks = list(stream_json_list(items, chunk_size=2))
+
+    assert json.loads("".join(chunks)) == items
+    assert len(chunks) == 2 + (count + 1) // 2
+
+
+@pytest.fixture
+def catalog(db):
+    session = db()
+    for artist_num in range(1, 4):
+        for album_letter in "ABC":
+            add_album(session, "RK", artist_num, album_letter)
+    add_album(session, "EM", 1, "A")
+    session.commit()
+
+
+@pytest.mark.parametrize("search, count", [
+    ({"genre": "", "artistName": "", "name": ""}, 10),
+    ({"genre": "Genre RK", "artistName": "Artist RK2", "name": ""}, 3),
+    ({"genre": "", "artistName": "", "name": "Nothing"}, 0),
+])
+def test_streamed_album_search_matches_list(client, catalog, search, count):
+    listed = client.post("/search/album", json=search).get_json()
+    streamed = client.post("/search/album?stream=1", json=search)
+
+    assert len(listed) == count
+    assert streamed.status_code == 200
+    assert streamed.is_streamed
+    assert streamed.mimetype == "application/json"
+    assert streamed.get_json() == listed
+
+
+@pytest.mark.parametrize("search, count", [({"genre": "", "name": ""}, 4), ({"genre": "", "name": "Nothing"}, 0)])
+def test_streamed_artist_search_matches_list(client, catalog, search, count):
+    listed = client.post("/search/artist", json=search).get_json()
+
+    assert len(listed) == count
+    assert client.post("/search/artist?stream=true", json=search).get_json() == listed
+
+
+def test_streamed_new_albums_match_list(client, catalog):
+    listed = client.get("/search/album").get_json()
+    assert len(listed) == 10
+    assert client.get("/search/album?stream=yes").get_json() == listed
+
+
+def test_streamed_program_search_of_nothing(client, db):
+    assert client.get("/search/program").get_json() == []
+    assert client.get("/search/program?stream=1").get_json() == []